@@ -5,6 +5,8 @@ class EnglishChatApp {
         this.chatHistory = [];
         this.currentMessageId = 0;
         this.markdownParsers = new Map(); // 用于存储每个消息的markdown解析器
+        this.pendingUtteranceId = null; // 语音输入对应的推测生成ID，发送时由后端认领
+        this.speculationDisabled = false; // 后端多进程部署时不支持推测生成
         this.init();
     }
 
@@ -218,6 +220,10 @@ Important Rules:
         // 生成消息ID
         const messageId = ++this.currentMessageId;
         
+        // 语音输入时后端可能已经根据中间识别结果提前开始生成
+        const utteranceId = this.pendingUtteranceId;
+        this.pendingUtteranceId = null;
+        
         // 禁用发送按钮
         const sendBtn = document.getElementById('chatSendBtn');
         sendBtn.disabled = true;
@@ -243,8 +249,8 @@ Important Rules:
 
             // 并行调用两个AI助手角色（流式输出）
             await Promise.all([
-                this.streamAgentResponse(agent1Prompt, userInput, messageId, 'agent1'),
-                this.streamAgentResponse(agent2Prompt, userInput, messageId, 'agent2')
+                this.streamAgentResponse(agent1Prompt, userInput, messageId, 'agent1', utteranceId),
+                this.streamAgentResponse(agent2Prompt, userInput, messageId, 'agent2', utteranceId)
             ]);
 
             // 保存到历史记录
@@ -334,11 +340,13 @@ Important Rules:
     }
 
     // 流式调用AI助手响应
-    async streamAgentResponse(prompt, userInput, messageId, agentType) {
+    async streamAgentResponse(prompt, userInput, messageId, agentType, utteranceId = null) {
         const currentApi = this.config.currentApi;
 
         const responseElement = document.getElementById(`${agentType}-${messageId}`);
         const typingIndicator = responseElement.parentElement.querySelector('.typing-indicator');
+        // 放弃流式响应时中止请求，后端会随之取消上游LLM调用
+        const abortController = new AbortController();
         
         try {
             // 构建对话历史消息数组
@@ -358,6 +366,12 @@ Important Rules:
                 stream: true
             };
             
+            // 带上语音输入ID，识别结果与推测时一致则直接复用已生成的内容
+            if (utteranceId) {
+                requestBody.utterance_id = utteranceId;
+                requestBody.agent = agentType;
+            }
+            
 
 
             // 调用本地Flask后端API
@@ -366,7 +380,8 @@ Important Rules:
                 headers: {
                     'Content-Type': 'application/json'
                 },
-                body: JSON.stringify(requestBody)
+                body: JSON.stringify(requestBody),
+                signal: abortController.signal
             });
 
             if (!response.ok) {
@@ -441,6 +456,9 @@ Important Rules:
         } catch (error) {
             console.error(`${agentType} 流式调用失败:`, error);
             
+            // 先中止仍在进行的流式请求，避免与备用调用重复消耗token
+            abortController.abort();
+            
             // 隐藏打字指示器
             typingIndicator.style.display = 'none';
             responseElement.style.display = 'block';
@@ -455,6 +473,54 @@ Important Rules:
         }
     }
 
+    // 根据稳定的语音识别中间结果，提前让两个AI助手开始生成
+    speculateAgents(utteranceId, partialText, stableMs) {
+        if (!this.config || !this.config.providers || this.speculationDisabled) return;
+        
+        const agents = {
+            agent1: document.getElementById('agent1Prompt').value,
+            agent2: document.getElementById('agent2Prompt').value
+        };
+        
+        Object.entries(agents).forEach(([agentType, prompt]) => {
+            const requestBody = {
+                provider: this.config.currentApi,
+                messages: this.buildMessagesWithHistory(prompt, partialText, agentType),
+                temperature: 0.7,
+                max_tokens: 1000,
+                utterance_id: utteranceId,
+                agent: agentType,
+                stable_ms: stableMs
+            };
+            
+            fetch('http://localhost:4399/api/llm/speculate', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify(requestBody)
+            }).then(response => response.json()).then(result => {
+                // 多进程部署时后端关闭了推测生成
+                if (result.status === 'disabled') {
+                    this.speculationDisabled = true;
+                }
+            }).catch(() => {
+                // 推测失败不影响正常发送
+            });
+        });
+    }
+
+    // 取消某次语音输入的推测生成
+    cancelSpeculation(utteranceId) {
+        fetch('http://localhost:4399/api/llm/speculate/cancel', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ utterance_id: utteranceId })
+        }).catch(() => {});
+    }
+
     // 构建包含历史对话的消息数组
     buildMessagesWithHistory(systemPrompt, currentUserInput, agentType) {
         const messages = [];
@@ -475,8 +541,8 @@ Important Rules:
             return messages;
         }
         
-        // 3. 添加历史对话（最多保留最近的5轮对话，减少token使用）
-        const maxHistoryRounds = 5;
+        // 3. 添加历史对话（后端会按token预算压缩，较早的对话转为摘要）
+        const maxHistoryRounds = 30;
         const recentHistory = this.chatHistory.slice(-maxHistoryRounds);
         
         let addedHistoryCount = 0;
@@ -788,6 +854,10 @@ let voiceStartTime = null;
 let voiceTimer = null;
 let currentVoiceText = '';
 let accumulatedVoiceText = ''; // 累积的语音识别文本
+let voiceUtteranceId = null; // 本次语音输入的ID，用于推测生成
+let speculationTimer = null;
+let lastSpeculatedText = '';
+const SPECULATION_STABLE_MS = 700; // 中间结果保持不变多久后开始推测生成
 
 // 初始化语音功能
 function initVoiceFeature() {
@@ -863,6 +933,8 @@ async function startVoiceRecording() {
     currentVoiceText = '';
     accumulatedVoiceText = ''; // 重置累积文本
     voiceStartTime = Date.now();
+    voiceUtteranceId = `utt-${Date.now()}-${Math.random().toString(36).slice(2, 10)}`;
+    lastSpeculatedText = '';
     updateVoiceTimer();
     
     // 清空实时识别结果显示
@@ -915,6 +987,11 @@ async function stopVoiceRecording() {
         const chatInput = document.getElementById('chatInput');
         chatInput.value = currentVoiceText.trim();
         
+        // 发送时由后端认领推测生成的结果
+        if (lastSpeculatedText) {
+            app.pendingUtteranceId = voiceUtteranceId;
+        }
+        
         // 重置语音UI
         resetVoiceInputUI();
         
@@ -923,6 +1000,9 @@ async function stopVoiceRecording() {
             app.sendChatMessage();
         }, 500);
     } else {
+        if (lastSpeculatedText) {
+            app.cancelSpeculation(voiceUtteranceId);
+        }
         resetVoiceInputUI();
         app.showNotification('未识别到语音内容', 'warning');
     }
@@ -948,6 +1028,10 @@ function resetVoiceInputUI() {
         clearInterval(voiceTimer);
         voiceTimer = null;
     }
+    if (speculationTimer) {
+        clearTimeout(speculationTimer);
+        speculationTimer = null;
+    }
     
     // 重置状态变量
     isVoiceRecording = false;
@@ -1015,9 +1099,27 @@ function handleVoiceResult(result) {
         if (realtimeTextElement) {
             realtimeTextElement.textContent = currentVoiceText;
         }
+        
+        scheduleSpeculation();
     }
 }
 
+// 识别文本保持稳定一段时间后，提前发起推测生成
+function scheduleSpeculation() {
+    if (speculationTimer) {
+        clearTimeout(speculationTimer);
+    }
+    
+    const text = currentVoiceText.trim();
+    speculationTimer = setTimeout(() => {
+        speculationTimer = null;
+        if (isVoiceRecording && text && text === currentVoiceText.trim() && text !== lastSpeculatedText) {
+            lastSpeculatedText = text;
+            app.speculateAgents(voiceUtteranceId, text, SPECULATION_STABLE_MS);
+        }
+    }, SPECULATION_STABLE_MS);
+}
+
 // 处理语音错误
 function handleVoiceError(error) {
     console.error('❌ 语音识别错误:', error);
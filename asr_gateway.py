@@ -0,0 +1,567 @@
+import os
+import hmac
+import json
+import time
+import uuid
+import queue
+import base64
+import random
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from urllib.parse import quote
+import numpy as np
+from event_logger import event_logger
+
+
+class RecognizerSession(ABC):
+    """
+    识别后端中的一路识别
+    feed/finish由网关的工作线程调用（同一路识别不会并发调用），
+    识别结果通过on_result回调返回：{"type": "interim"/"final", "text": ..., "index": ...}
+    """
+
+    @abstractmethod
+    def feed(self, pcm_data):
+        """送入一批PCM音频"""
+
+    def finish(self):
+        """音频结束，等待最后的识别结果"""
+
+    def close(self):
+        """释放连接，可重复调用"""
+
+
+class RecognizerBackend(ABC):
+    """识别后端：限制同时打开的识别路数，超出时拒绝新的识别流"""
+
+    name = None
+
+    def __init__(self, max_sessions=100):
+        self.max_sessions = max_sessions
+        self.active = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self.active >= self.max_sessions:
+                return False
+            self.active += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.active = max(0, self.active - 1)
+
+    @abstractmethod
+    def open_session(self, stream_id, sample_rate, on_result):
+        """打开一路识别，返回RecognizerSession"""
+
+    def get_stats(self):
+        return {"active": self.active, "max_sessions": self.max_sessions}
+
+
+class LocalRecognizerSession(RecognizerSession):
+
+    def __init__(self, backend, sample_rate, on_result):
+        self.backend = backend
+        self.on_result = on_result
+        self.frame_bytes = sample_rate * backend.FRAME_MS // 1000 * 2
+        self._remainder = b''
+        self.index = 0
+        self.words = 0
+        self.reported_words = 0
+        self.voiced_run = 0
+        self.silence_run = 0
+
+    def feed(self, pcm_data):
+        data = self._remainder + pcm_data
+        frame_count = len(data) // self.frame_bytes
+        self._remainder = data[frame_count * self.frame_bytes:]
+        if not frame_count:
+            return
+
+        samples = np.frombuffer(data[:frame_count * self.frame_bytes], dtype=np.int16)
+        frames = samples.reshape(frame_count, -1).astype(np.float32)
+        voiced_frames = np.sqrt(np.mean(frames * frames, axis=1)) > self.backend.energy_threshold
+
+        for voiced in voiced_frames:
+            if voiced:
+                self.voiced_run += 1
+                self.silence_run = 0
+                if self.voiced_run == self.backend.min_voiced_frames:
+                    self.words += 1
+            else:
+                self.voiced_run = 0
+                self.silence_run += 1
+                if self.words and self.silence_run == self.backend.endpoint_frames:
+                    self._emit_final()
+
+        if self.words != self.reported_words:
+            self.reported_words = self.words
+            self.on_result({"type": "interim", "text": self._text(), "index": self.index})
+
+    def finish(self):
+        if self.words:
+            self._emit_final()
+
+    def _emit_final(self):
+        self.on_result({"type": "final", "text": self._text(), "index": self.index})
+        self.index += 1
+        self.words = self.reported_words = 0
+
+    def _text(self):
+        return ' '.join(['word'] * self.words)
+
+
+class LocalRecognizerBackend(RecognizerBackend):
+    """
+    本地替身识别器，不联网，用于测试和基准测试
+    按20ms帧的能量检测语音段，每个足够长的语音段记为一个"word"，静音超过端点时长后输出最终结果
+    """
+
+    name = 'local'
+    FRAME_MS = 20
+
+    def __init__(self, max_sessions=10000, energy_threshold=500, min_voiced_ms=60, endpoint_silence_ms=500):
+        super().__init__(max_sessions)
+        self.energy_threshold = energy_threshold
+        self.min_voiced_frames = max(1, min_voiced_ms // self.FRAME_MS)
+        self.endpoint_frames = max(1, endpoint_silence_ms // self.FRAME_MS)
+
+    def open_session(self, stream_id, sample_rate, on_result):
+        return LocalRecognizerSession(self, sample_rate, on_result)
+
+
+class TencentRealtimeSession(RecognizerSession):
+
+    def __init__(self, connection, stream_id, on_result, finish_timeout):
+        self.connection = connection
+        self.stream_id = stream_id
+        self.on_result = on_result
+        self.finish_timeout = finish_timeout
+        self._finished = threading.Event()
+        self._reader = threading.Thread(target=self._read, name=f'asr-tencent-{stream_id[:8]}', daemon=True)
+        self._reader.start()
+
+    def _read(self):
+        try:
+            for message in self.connection:
+                data = json.loads(message)
+                if data.get('code', 0) != 0:
+                    self.on_result({"type": "error", "code": data.get('code'), "error": data.get('message')})
+                    return
+                result = data.get('result')
+                if result and result.get('voice_text_str'):
+                    # slice_type: 0 一句话开始, 1 识别中, 2 一句话结束
+                    self.on_result({
+                        "type": "final" if result.get('slice_type') == 2 else "interim",
+                        "text": result['voice_text_str'],
+                        "index": result.get('index', 0)
+                    })
+                if data.get('final') == 1:
+                    return
+        except Exception as e:
+            if not self._finished.is_set():
+                event_logger.warning('asr.tencent_read_failed', stream_id=self.stream_id, error=e)
+        finally:
+            self._finished.set()
+
+    def feed(self, pcm_data):
+        self.connection.send(pcm_data)
+
+    def finish(self):
+        if not self._finished.is_set():
+            self.connection.send(json.dumps({"type": "end"}))
+            self._finished.wait(self.finish_timeout)
+
+    def close(self):
+        self._finished.set()
+        self.connection.close()
+
+
+class TencentRealtimeBackend(RecognizerBackend):
+    """
+    腾讯云实时语音识别（WebSocket）
+    使用服务端的永久密钥签名，不再为每个浏览器会话调用GetFederationToken
+    """
+
+    name = 'tencent'
+    HOST = 'asr.cloud.tencent.com'
+
+    def __init__(self, app_id, secret_id, secret_key, engine_model_type='16k_zh', max_sessions=200,
+                 finish_timeout=5):
+        super().__init__(max_sessions)
+        self.app_id = app_id
+        self.secret_id = secret_id
+        self.secret_key = secret_key
+        self.engine_model_type = engine_model_type
+        self.finish_timeout = finish_timeout
+
+    @classmethod
+    def from_env(cls):
+        """配置齐全且安装了websockets时返回实例，否则返回None"""
+        try:
+            import websockets.sync.client  # noqa: F401
+        except ImportError:
+            return None
+        app_id = os.getenv('TENCENT_ASR_APP_ID')
+        secret_id = os.getenv('TENCENT_ASR_SECRET_ID')
+        secret_key = os.getenv('TENCENT_ASR_SECRET_KEY')
+        if not all([app_id, secret_id, secret_key]):
+            return None
+        return cls(app_id, secret_id, secret_key,
+                   engine_model_type=os.getenv('TENCENT_ASR_ENGINE_TYPE', '16k_zh'),
+                   max_sessions=int(os.getenv('ASR_GATEWAY_TENCENT_MAX_SESSIONS', '200')))
+
+    def signed_url(self, voice_id):
+        now = int(time.time())
+        params = {
+            "secretid": self.secret_id,
+            "timestamp": now,
+            "expired": now + 3600,
+            "nonce": random.randint(1, 10 ** 9),
+            "engine_model_type": self.engine_model_type,
+            "voice_id": voice_id,
+            "voice_format": 1,
+            "needvad": 1
+        }
+        query = '&'.join(f"{key}={params[key]}" for key in sorted(params))
+        sign_source = f"{self.HOST}/asr/v2/{self.app_id}?{query}"
+        signature = base64.b64encode(
+            hmac.new(self.secret_key.encode('utf-8'), sign_source.encode('utf-8'), hashlib.sha1).digest()
+        ).decode('utf-8')
+        return f"wss://{sign_source}&signature={quote(signature, safe='')}"
+
+    def open_session(self, stream_id, sample_rate, on_result):
+        from websockets.sync.client import connect
+
+        connection = connect(self.signed_url(stream_id), open_timeout=10)
+        try:
+            handshake = json.loads(connection.recv(timeout=10))
+        except Exception:
+            connection.close()
+            raise
+        if handshake.get('code', 0) != 0:
+            connection.close()
+            raise ConnectionError(f"腾讯云识别连接失败: {handshake.get('message')}")
+        return TencentRealtimeSession(connection, stream_id, on_result, self.finish_timeout)
+
+
+class ASRStream:
+    """网关中的一路识别流"""
+
+    def __init__(self, stream_id, sid, backend):
+        self.id = stream_id
+        self.sid = sid
+        self.backend = backend
+        self.session = None
+        self.lock = threading.Lock()
+        self.pending = bytearray()
+        self.scheduled = False
+        self.closing = False
+        self.cancelled = False
+        self.pending_interim = None
+        self.last_interim_at = 0
+        self.created_at = time.time()
+        self.bytes_in = 0
+        self.frames_in = 0
+        self.frames_rejected = 0
+
+
+class ASRGateway:
+    """
+    服务端流式语音识别网关
+    客户端通过已有的SocketIO连接上传CHUNK_SIZE大小的PCM帧，网关按识别流缓冲并攒批，
+    由固定数量的工作线程转发给可插拔的识别后端（多路识别流复用同一组线程），识别结果再推回客户端
+
+    背压：
+      - 上行：每路识别流的待处理音频有上限，超出时拒绝该帧（ack中accepted为False），客户端应暂停发送
+      - 下行：中间结果按interim_interval合并，只发送最新的一条；最终结果总是发送
+    """
+
+    BYTES_PER_MS = 32  # 16kHz单声道int16
+
+    def __init__(self, workers=4, batch_bytes=5120, max_pending_bytes=64000, interim_interval_ms=200,
+                 max_streams_per_client=4, max_frame_bytes=64 * 1024):
+        self.workers = workers
+        self.batch_bytes = batch_bytes
+        self.max_pending_bytes = max_pending_bytes
+        self.interim_interval = interim_interval_ms / 1000
+        self.max_streams_per_client = max_streams_per_client
+        self.max_frame_bytes = max_frame_bytes
+        self.backends = {}
+        self.default_backend = None
+        # emit(sid, event, payload)，由SocketIO处理器设置
+        self.emit = None
+
+        self.streams = {}
+        self._lock = threading.Lock()
+        self._ready = queue.Queue()
+        self._threads = []
+
+        self.opened = 0
+        self.rejected_open = 0
+        self.closed = 0
+        self.frames_in = 0
+        self.frames_rejected = 0
+        self.batches = 0
+        self.batched_bytes = 0
+        self.interims_sent = 0
+        self.interims_coalesced = 0
+        self.finals_sent = 0
+        self.backend_errors = 0
+
+    def register_backend(self, backend, default=False):
+        self.backends[backend.name] = backend
+        if default or self.default_backend is None:
+            self.default_backend = backend.name
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'asr-gateway-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def open_stream(self, sid, backend_name=None, sample_rate=16000, stream_id=None):
+        """
+        打开一路识别流
+
+        Returns:
+            tuple: (ASRStream, None) 或 (None, 错误信息)
+        """
+        if sample_rate != 16000:
+            return None, "仅支持16kHz单声道16bit PCM"
+        backend = self.backends.get(backend_name or self.default_backend)
+        if backend is None:
+            return None, f"未知的识别后端: {backend_name}"
+
+        with self._lock:
+            client_streams = sum(1 for stream in self.streams.values() if stream.sid == sid)
+            if client_streams >= self.max_streams_per_client:
+                self.rejected_open += 1
+                return None, "识别流数量超过上限"
+        if not backend.acquire():
+            with self._lock:
+                self.rejected_open += 1
+            return None, "识别服务繁忙，请稍后重试"
+
+        stream = ASRStream(stream_id or uuid.uuid4().hex, sid, backend)
+        try:
+            stream.session = backend.open_session(stream.id, sample_rate,
+                                                  lambda result: self._on_result(stream, result))
+        except Exception as e:
+            backend.release()
+            with self._lock:
+                self.backend_errors += 1
+            event_logger.error('asr.open_failed', backend=backend.name, error=e)
+            return None, "识别服务连接失败"
+
+        self._ensure_started()
+        with self._lock:
+            self.streams[stream.id] = stream
+            self.opened += 1
+        event_logger.info('asr.stream_opened', stream_id=stream.id, backend=backend.name)
+        return stream, None
+
+    def _get(self, sid, stream_id):
+        stream = self.streams.get(stream_id)
+        if stream is None or stream.sid != sid:
+            return None
+        return stream
+
+    def push_audio(self, sid, stream_id, data):
+        """
+        接收一帧音频，返回给客户端的ack
+        """
+        stream = self._get(sid, stream_id)
+        if stream is None or stream.closing:
+            return {"accepted": False, "error": "识别流不存在或已结束"}
+        if len(data) > self.max_frame_bytes or len(data) % 2:
+            return {"accepted": False, "error": "音频帧大小无效"}
+
+        with stream.lock:
+            if len(stream.pending) + len(data) > self.max_pending_bytes:
+                stream.frames_rejected += 1
+                self.frames_rejected += 1
+                return {
+                    "accepted": False,
+                    "backlog_ms": len(stream.pending) // self.BYTES_PER_MS
+                }
+            stream.pending += data
+            stream.bytes_in += len(data)
+            stream.frames_in += 1
+            self.frames_in += 1
+            backlog = len(stream.pending)
+            schedule = not stream.scheduled and backlog >= self.batch_bytes
+            if schedule:
+                stream.scheduled = True
+        if schedule:
+            self._ready.put(stream)
+        return {"accepted": True, "backlog_ms": backlog // self.BYTES_PER_MS}
+
+    def close_stream(self, sid, stream_id):
+        """音频结束：处理剩余数据、输出最终结果后关闭"""
+        stream = self._get(sid, stream_id)
+        if stream is None:
+            return False
+        self._mark_closing(stream)
+        return True
+
+    def close_client(self, sid):
+        """客户端断开连接，直接丢弃其全部识别流"""
+        with self._lock:
+            streams = [stream for stream in self.streams.values() if stream.sid == sid]
+        for stream in streams:
+            stream.cancelled = True
+            self._mark_closing(stream)
+        return len(streams)
+
+    def _mark_closing(self, stream):
+        with stream.lock:
+            stream.closing = True
+            schedule = not stream.scheduled
+            stream.scheduled = True
+        if schedule:
+            self._ready.put(stream)
+
+    def _run(self):
+        while True:
+            stream = self._ready.get()
+            try:
+                self._process(stream)
+            except Exception as e:
+                event_logger.error('asr.worker_failed', stream_id=stream.id, error=e)
+
+    def _process(self, stream):
+        with stream.lock:
+            data = bytes(stream.pending)
+            stream.pending.clear()
+            closing = stream.closing
+
+        try:
+            if data and not stream.cancelled:
+                stream.session.feed(data)
+                self.batches += 1
+                self.batched_bytes += len(data)
+            self._flush_interim(stream)
+            if closing:
+                if not stream.cancelled:
+                    stream.session.finish()
+                self._finalize(stream)
+                return
+        except Exception as e:
+            self.backend_errors += 1
+            event_logger.warning('asr.backend_failed', stream_id=stream.id, backend=stream.backend.name, error=e)
+            self._send(stream, 'asr_error', {"stream_id": stream.id, "error": "识别服务中断"})
+            self._finalize(stream)
+            return
+
+        with stream.lock:
+            reschedule = stream.closing or len(stream.pending) >= self.batch_bytes
+            stream.scheduled = reschedule
+        if reschedule:
+            self._ready.put(stream)
+
+    def _finalize(self, stream):
+        with self._lock:
+            if self.streams.pop(stream.id, None) is None:
+                return
+            self.closed += 1
+        try:
+            stream.session.close()
+        except Exception:
+            pass
+        stream.backend.release()
+        if not stream.cancelled:
+            self._send(stream, 'asr_closed', {
+                "stream_id": stream.id,
+                "frames": stream.frames_in,
+                "frames_rejected": stream.frames_rejected,
+                "audio_ms": stream.bytes_in // self.BYTES_PER_MS
+            })
+        event_logger.info('asr.stream_closed', stream_id=stream.id, backend=stream.backend.name,
+                          cancelled=stream.cancelled, frames=stream.frames_in,
+                          frames_rejected=stream.frames_rejected,
+                          duration_ms=round((time.time() - stream.created_at) * 1000, 1))
+
+    def _on_result(self, stream, result):
+        """识别后端的结果回调，可能来自工作线程或后端自己的读取线程"""
+        if stream.cancelled:
+            return
+        payload = dict(result, stream_id=stream.id)
+        if result.get('type') == 'interim':
+            with stream.lock:
+                if stream.pending_interim is not None:
+                    self.interims_coalesced += 1
+                stream.pending_interim = payload
+            self._flush_interim(stream)
+        elif result.get('type') == 'final':
+            with stream.lock:
+                # 最终结果取代尚未发送的中间结果
+                if stream.pending_interim is not None:
+                    self.interims_coalesced += 1
+                    stream.pending_interim = None
+            self.finals_sent += 1
+            self._send(stream, 'asr_result', payload)
+        else:
+            self._send(stream, 'asr_error', payload)
+
+    def _flush_interim(self, stream):
+        now = time.monotonic()
+        with stream.lock:
+            payload = stream.pending_interim
+            if payload is None or now - stream.last_interim_at < self.interim_interval:
+                return
+            stream.pending_interim = None
+            stream.last_interim_at = now
+        self.interims_sent += 1
+        self._send(stream, 'asr_result', payload)
+
+    def _send(self, stream, event, payload):
+        if self.emit is None:
+            return
+        try:
+            self.emit(stream.sid, event, payload)
+        except Exception as e:
+            event_logger.warning('asr.emit_failed', stream_id=stream.id, event=event, error=e)
+
+    def get_stats(self):
+        with self._lock:
+            active = len(self.streams)
+        return {
+            "active_streams": active,
+            "workers": self.workers,
+            "queued": self._ready.qsize(),
+            "opened": self.opened,
+            "rejected_open": self.rejected_open,
+            "closed": self.closed,
+            "frames_in": self.frames_in,
+            "frames_rejected": self.frames_rejected,
+            "batches": self.batches,
+            "avg_batch_bytes": round(self.batched_bytes / self.batches) if self.batches else None,
+            "interims_sent": self.interims_sent,
+            "interims_coalesced": self.interims_coalesced,
+            "finals_sent": self.finals_sent,
+            "backend_errors": self.backend_errors,
+            "backends": {name: backend.get_stats() for name, backend in self.backends.items()},
+            "default_backend": self.default_backend
+        }
+
+
+# 全局识别网关实例
+asr_gateway = ASRGateway(
+    workers=int(os.getenv('ASR_GATEWAY_WORKERS', str((os.cpu_count() or 1) * 2))),
+    batch_bytes=int(os.getenv('ASR_GATEWAY_BATCH_MS', '160')) * ASRGateway.BYTES_PER_MS,
+    max_pending_bytes=int(os.getenv('ASR_GATEWAY_MAX_BACKLOG_MS', '2000')) * ASRGateway.BYTES_PER_MS,
+    interim_interval_ms=int(os.getenv('ASR_GATEWAY_INTERIM_INTERVAL_MS', '200'))
+)
+asr_gateway.register_backend(LocalRecognizerBackend())
+_tencent_backend = TencentRealtimeBackend.from_env()
+if _tencent_backend is not None:
+    asr_gateway.register_backend(_tencent_backend, default=True)
+if os.getenv('ASR_GATEWAY_BACKEND') in asr_gateway.backends:
+    asr_gateway.default_backend = os.getenv('ASR_GATEWAY_BACKEND')
@@ -0,0 +1,141 @@
+import io
+import os
+import re
+import wave
+import uuid
+import hashlib
+import threading
+from event_logger import event_logger
+
+
+class AudioBlobStore:
+    """
+    处理后音频的内容寻址存储
+    以SHA-256作为文件名写入本地目录，相同内容只存一份；
+    总大小超过上限时按最近访问时间（文件mtime）淘汰，多个worker进程共享同一目录也能保持一致
+    """
+
+    BLOB_ID_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+    EXTENSION = '.wav'
+
+    def __init__(self, root='audio_blobs', max_bytes=512 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None
+
+        self.stored = 0
+        self.deduplicated = 0
+        self.evicted = 0
+
+    def _path(self, blob_id):
+        return os.path.join(self.root, blob_id + self.EXTENSION)
+
+    def _scan(self):
+        """返回 [(mtime, size, path)]，按最久未访问排序"""
+        entries = []
+        try:
+            with os.scandir(self.root) as it:
+                for entry in it:
+                    if entry.is_file() and entry.name.endswith(self.EXTENSION):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except FileNotFoundError:
+            pass
+        entries.sort()
+        return entries
+
+    @staticmethod
+    def pcm_to_wav(pcm_data, sample_rate, channels, sample_width):
+        """给PCM数据加上WAV头，便于浏览器直接播放"""
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as wav_file:
+            wav_file.setnchannels(channels)
+            wav_file.setsampwidth(sample_width)
+            wav_file.setframerate(sample_rate)
+            wav_file.writeframes(pcm_data)
+        return buffer.getvalue()
+
+    def put(self, data):
+        """
+        存入音频数据，返回blob_id
+        """
+        blob_id = hashlib.sha256(data).hexdigest()
+        path = self._path(blob_id)
+
+        with self._lock:
+            if os.path.exists(path):
+                os.utime(path)
+                self.deduplicated += 1
+                return blob_id
+
+            os.makedirs(self.root, exist_ok=True)
+            # 先写临时文件再原子替换，读取方不会看到写了一半的文件
+            tmp_path = os.path.join(self.root, f".{blob_id}.{uuid.uuid4().hex}.tmp")
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self.stored += 1
+
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._scan())
+            else:
+                self._total_bytes += len(data)
+            if self._total_bytes > self.max_bytes:
+                self._evict(keep=path)
+
+        return blob_id
+
+    def put_pcm(self, pcm_data, sample_rate, channels, sample_width):
+        return self.put(self.pcm_to_wav(pcm_data, sample_rate, channels, sample_width))
+
+    def _evict(self, keep=None):
+        """重新扫描目录（其他进程可能也写入了文件），淘汰最久未访问的文件直到低于上限"""
+        entries = self._scan()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+                self.evicted += 1
+            except FileNotFoundError:
+                total -= size
+            except OSError as e:
+                event_logger.warning('audio_blob.evict_failed', path=path, error=e)
+        self._total_bytes = total
+
+    def open_path(self, blob_id):
+        """
+        返回blob对应的文件路径并更新访问时间，不存在或ID非法时返回None
+        """
+        if not self.BLOB_ID_PATTERN.match(blob_id or ''):
+            return None
+        path = self._path(blob_id)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def get_stats(self):
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._scan())
+            return {
+                "total_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "stored": self.stored,
+                "deduplicated": self.deduplicated,
+                "evicted": self.evicted
+            }
+
+
+# 全局音频存储实例
+audio_blob_store = AudioBlobStore(
+    root=os.getenv('AUDIO_BLOB_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'audio_blobs')),
+    max_bytes=int(os.getenv('AUDIO_BLOB_MAX_MB', '512')) * 1024 * 1024
+)
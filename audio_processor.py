@@ -2,12 +2,47 @@ import io
 import numpy as np
 from typing import Optional, Tuple, List, Dict
 import base64
+from event_logger import event_logger
+
+# 压缩音频（Opus/WebM/Ogg）解码，PyAV的wheel自带FFmpeg和libopus，无需联网或系统库
+try:
+    import av
+    AV_AVAILABLE = True
+except ImportError:
+    AV_AVAILABLE = False
+
+
+class _ChunkReader(io.RawIOBase):
+    """把分块数据的迭代器包装成只读文件对象，解码器按需拉取下一块"""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        while not self._buffer:
+            try:
+                self._buffer = bytes(next(self._chunks))
+            except StopIteration:
+                return 0
+        size = min(len(target), len(self._buffer))
+        target[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
 
 class AudioProcessor:
     TARGET_SAMPLE_RATE = 16000
     TARGET_CHANNELS = 1
     TARGET_SAMPLE_WIDTH = 2
     CHUNK_SIZE = 1280
+    # 压缩音频每次送入解码器的字节数
+    DECODE_CHUNK_SIZE = 16 * 1024
+    # 需要解码后才能使用的容器格式
+    COMPRESSED_FORMATS = {'webm', 'ogg', 'opus', 'mp3'}
     
     def __init__(self):
         self.sample_rate = self.TARGET_SAMPLE_RATE
@@ -18,10 +53,43 @@ class AudioProcessor:
         try:
             if source_format.lower() == 'pcm':
                 return audio_data
+            if source_format.lower() in self.COMPRESSED_FORMATS:
+                return self.decode_to_pcm(audio_data)
             # 简化版本，直接返回
             return audio_data
         except Exception as e:
-            print(f"音频格式转换失败: {e}")
+            event_logger.error('audio.convert_failed', source_format=source_format, error=e)
+            return None
+    
+    def iter_decode_pcm(self, chunks):
+        """
+        流式解码压缩音频
+        逐块读取输入（bytes的迭代器），每解出一帧就重采样为16kHz单声道int16并立即返回，
+        不需要先拿到完整文件，内存占用与音频时长无关
+        """
+        if not AV_AVAILABLE:
+            raise RuntimeError("压缩音频解码需要安装PyAV (pip install av)")
+        
+        resampler = av.AudioResampler(format='s16', layout='mono', rate=self.TARGET_SAMPLE_RATE)
+        with av.open(_ChunkReader(chunks), mode='r') as container:
+            stream = container.streams.audio[0]
+            for frame in container.decode(stream):
+                for resampled in resampler.resample(frame):
+                    yield self._frame_to_bytes(resampled)
+        # 取出重采样器中缓存的最后一段
+        for resampled in resampler.resample(None):
+            yield self._frame_to_bytes(resampled)
+    
+    @staticmethod
+    def _frame_to_bytes(frame):
+        return frame.to_ndarray().astype(np.int16, copy=False).tobytes()
+    
+    def decode_to_pcm(self, audio_data: bytes):
+        """把完整的压缩音频解码为16kHz单声道int16 PCM，失败时返回None"""
+        try:
+            return b''.join(self.iter_decode_pcm(self.chunk_audio_data(audio_data, self.DECODE_CHUNK_SIZE)))
+        except Exception as e:
+            event_logger.error('audio.decode_failed', input_bytes=len(audio_data), error=e)
             return None
     
     def chunk_audio_data(self, audio_data: bytes, chunk_size: int = None):
@@ -56,14 +124,14 @@ class AudioProcessor:
         try:
             return base64.b64decode(base64_data)
         except Exception as e:
-            print(f"Base64解码失败: {e}")
+            event_logger.error('audio.base64_decode_failed', error=e)
             return None
     
     def audio_to_base64(self, audio_data: bytes):
         try:
             return base64.b64encode(audio_data).decode('utf-8')
         except Exception as e:
-            print(f"Base64编码失败: {e}")
+            event_logger.error('audio.base64_encode_failed', error=e)
             return ""
     
     def detect_audio_format(self, audio_data: bytes):
@@ -72,10 +140,15 @@ class AudioProcessor:
                 return 'wav'
             elif audio_data.startswith(b'ID3') or audio_data.startswith(b'\xff\xfb'):
                 return 'mp3'
+            elif audio_data.startswith(b'\x1a\x45\xdf\xa3'):
+                # EBML头，浏览器MediaRecorder输出的WebM(Opus)
+                return 'webm'
+            elif audio_data.startswith(b'OggS'):
+                return 'ogg'
             else:
                 return 'pcm'
         except Exception as e:
-            print(f"音频格式检测失败: {e}")
+            event_logger.error('audio.detect_format_failed', error=e)
             return None
     
     def extract_audio_info(self, audio_data: bytes, format: str = 'wav'):
@@ -88,7 +161,7 @@ class AudioProcessor:
             info['duration'] = info['frames'] / info['sample_rate']
             return info
         except Exception as e:
-            print(f"提取音频信息失败: {e}")
+            event_logger.error('audio.extract_info_failed', error=e)
             return None
     
     def normalize_audio(self, audio_data: bytes):
@@ -108,7 +181,7 @@ class AudioProcessor:
             else:
                 return audio_data
         except Exception as e:
-            print(f"音频标准化失败: {e}")
+            event_logger.error('audio.normalize_failed', error=e)
             return audio_data
 
 audio_processor = AudioProcessor()
@@ -0,0 +1,126 @@
+"""
+语音识别网关基准测试：单进程能同时承载多少路实时识别流
+
+每个模拟客户端是一个SocketIO测试客户端，按实时速率（每40ms一帧CHUNK_SIZE字节）发送
+合成的"说话-停顿"音频，识别后端使用本地替身（local），因此测得的是网关本身的开销：
+SocketIO事件分发、攒批、工作线程调度、背压和结果推送
+统计整个进程的CPU时间（包含模拟客户端自身的开销），得到的每核路数是保守值
+
+用法:
+    python benchmarks/bench_asr_gateway.py --streams 50 100 200 --seconds 10
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+# STS模块导入时需要腾讯云配置，基准测试只使用本地识别后端
+for key in ('TENCENT_ASR_APP_ID', 'TENCENT_ASR_SECRET_ID', 'TENCENT_ASR_SECRET_KEY'):
+    os.environ.setdefault(key, 'benchmark')
+os.environ['ASR_GATEWAY_BACKEND'] = 'local'
+
+from flask import Flask
+from flask_socketio import SocketIO
+from audio_processor import AudioProcessor
+from asr_gateway import asr_gateway
+from websocket_handler import create_asr_gateway_socketio_handler
+
+SAMPLE_RATE = AudioProcessor.TARGET_SAMPLE_RATE
+CHUNK_SIZE = AudioProcessor.CHUNK_SIZE
+FRAME_SECONDS = CHUNK_SIZE / 2 / SAMPLE_RATE
+
+
+def synth_utterances(seconds, seed):
+    """1.5秒语音（音节状的能量包络）+ 0.7秒停顿，循环"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    voiced = np.sin(2 * np.pi * 160 * t) * (np.sin(2 * np.pi * 4 * t) > -0.3)
+    speaking = (t % 2.2) < 1.5
+    signal = 0.4 * voiced * speaking + 0.002 * rng.standard_normal(t.size)
+    return (signal * 32767).astype(np.int16).tobytes()
+
+
+def run(app, socketio, streams, seconds):
+    clients = [socketio.test_client(app) for _ in range(streams)]
+    stream_ids = []
+    for client in clients:
+        client.emit('asr_start', {'backend': 'local'})
+        started = [event for event in client.get_received() if event['name'] == 'asr_started']
+        stream_ids.append(started[0]['args'][0]['stream_id'])
+
+    audio = synth_utterances(seconds, seed=streams)
+    frames = [audio[i:i + CHUNK_SIZE] for i in range(0, len(audio), CHUNK_SIZE)]
+
+    rejected = 0
+    late_ticks = 0
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    for tick, frame in enumerate(frames):
+        for client, stream_id in zip(clients, stream_ids):
+            ack = client.emit('asr_audio', {'stream_id': stream_id, 'audio': frame}, callback=True)
+            if not ack['accepted']:
+                rejected += 1
+        # 按实时速率发送；一轮发送超过40ms说明已无法跟上实时
+        delay = wall_start + (tick + 1) * FRAME_SECONDS - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            late_ticks += 1
+
+    for client, stream_id in zip(clients, stream_ids):
+        client.emit('asr_stop', {'stream_id': stream_id})
+    deadline = time.time() + 10
+    while asr_gateway.get_stats()['active_streams'] and time.time() < deadline:
+        time.sleep(0.01)
+    cpu_seconds = time.process_time() - cpu_start
+    wall_seconds = time.perf_counter() - wall_start
+
+    finals = interims = 0
+    for client in clients:
+        for event in client.get_received():
+            if event['name'] == 'asr_result':
+                if event['args'][0]['type'] == 'final':
+                    finals += 1
+                else:
+                    interims += 1
+        client.disconnect()
+
+    cores_used = cpu_seconds / wall_seconds
+    return {
+        "streams": streams,
+        "cores_used": cores_used,
+        "streams_per_core": streams / cores_used if cores_used else float('inf'),
+        "realtime": late_ticks / len(frames) < 0.05,
+        "rejected": rejected,
+        "finals": finals,
+        "interims": interims
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="语音识别网关并发基准测试")
+    parser.add_argument('--streams', type=int, nargs='+', default=[25, 50, 100, 200])
+    parser.add_argument('--seconds', type=float, default=8.0, help="每路音频时长")
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    socketio = SocketIO(app, async_mode='threading')
+    create_asr_gateway_socketio_handler(socketio)
+
+    print(f"CPU核数: {os.cpu_count()}, 网关工作线程: {asr_gateway.workers}, 每路 {args.seconds:.0f}s 音频")
+    print(f"{'路数':>6}{'占用核数':>10}{'每核路数':>10}{'实时':>6}{'拒绝帧':>8}{'最终结果':>10}{'中间结果':>10}")
+    for streams in args.streams:
+        result = run(app, socketio, streams, args.seconds)
+        print(f"{result['streams']:>6}{result['cores_used']:>10.2f}{result['streams_per_core']:>10.0f}"
+              f"{'是' if result['realtime'] else '否':>6}{result['rejected']:>8}"
+              f"{result['finals']:>10}{result['interims']:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+压缩音频上传基准测试：浏览器MediaRecorder格式（Opus in WebM/Ogg） vs 16kHz int16 PCM
+
+用PyAV在本地生成类似语音的测试片段并编码（48kHz，与浏览器录音一致），然后对比：
+  - 上传体积（base64前的字节数）
+  - AudioProcessor 解码为16kHz单声道int16的耗时（每个片段）
+全程离线运行
+
+用法:
+    python benchmarks/bench_audio_decode.py --seconds 5 --clips 20 --bitrate 24000
+"""
+
+import argparse
+import io
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import av
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+from audio_processor import audio_processor
+
+SOURCE_RATE = 48000
+
+
+def synth_speech(seconds, seed):
+    """带音节包络和共振峰的合成信号，比纯正弦更接近语音的编码难度"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SOURCE_RATE)) / SOURCE_RATE
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / SOURCE_RATE
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 12))
+    envelope = np.clip(np.sin(2 * np.pi * 3.5 * t + rng.uniform(0, 6)), 0, None) ** 0.6
+    signal = 0.3 * voiced * envelope + 0.01 * rng.standard_normal(t.size)
+    return (np.clip(signal, -1, 1) * 32767).astype(np.int16)
+
+
+def encode(samples, container_format, bitrate):
+    buffer = io.BytesIO()
+    with av.open(buffer, mode='w', format=container_format) as container:
+        stream = container.add_stream('libopus', rate=SOURCE_RATE)
+        stream.bit_rate = bitrate
+        stream.layout = 'mono'
+        frame = av.AudioFrame.from_ndarray(samples.reshape(1, -1), format='s16', layout='mono')
+        frame.sample_rate = SOURCE_RATE
+        for packet in stream.encode(frame):
+            container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+    return buffer.getvalue()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Opus(WebM/Ogg)上传解码基准测试")
+    parser.add_argument('--seconds', type=float, default=5.0, help="每个片段的时长")
+    parser.add_argument('--clips', type=int, default=20)
+    parser.add_argument('--bitrate', type=int, default=24000, help="Opus码率(bps)")
+    args = parser.parse_args()
+
+    clips = [synth_speech(args.seconds, seed) for seed in range(args.clips)]
+    pcm_bytes = int(args.seconds * audio_processor.TARGET_SAMPLE_RATE) * audio_processor.TARGET_SAMPLE_WIDTH
+
+    print(f"片段: {args.clips} x {args.seconds:.1f}s, Opus {args.bitrate // 1000} kbps")
+    print(f"16kHz int16 PCM: {pcm_bytes / 1024:.1f} KiB/片段")
+    print(f"{'格式':<6}{'大小(KiB)':>10}{'压缩比':>8}{'解码均值(ms)':>14}{'p95(ms)':>10}{'实时倍数':>10}")
+
+    for container_format in ('webm', 'ogg'):
+        encoded = [encode(samples, container_format, args.bitrate) for samples in clips]
+        detected = audio_processor.detect_audio_format(encoded[0])
+        assert detected == container_format, detected
+
+        timings = []
+        for data in encoded:
+            start = time.perf_counter()
+            pcm = audio_processor.convert_to_pcm(data, detected)
+            timings.append((time.perf_counter() - start) * 1000)
+            assert pcm and abs(len(pcm) - pcm_bytes) <= 0.05 * pcm_bytes, len(pcm or b'')
+
+        size = statistics.mean(len(data) for data in encoded)
+        mean_ms = statistics.mean(timings)
+        print(f"{container_format:<6}{size / 1024:>10.1f}{pcm_bytes / size:>7.1f}x"
+              f"{mean_ms:>14.2f}{percentile(timings, 0.95):>10.2f}"
+              f"{args.seconds * 1000 / mean_ms:>9.0f}x")
+
+
+if __name__ == '__main__':
+    main()
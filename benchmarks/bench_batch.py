@@ -0,0 +1,101 @@
+"""
+批量接口基准测试：逐条调用 /api/llm（非流式） vs 一次调用 /api/llm/batch
+
+上游LLM使用本地模拟服务（benchmarks/mock_llm_upstream.py），每次调用耗时约 tokens * delay 秒
+
+用法:
+    python benchmarks/bench_batch.py --items 40 --parallelism 8
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import requests
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from mock_llm_upstream import start_mock_upstream
+
+
+def start_proxy(endpoint):
+    """在后台线程中启动代理服务，返回其地址"""
+    os.environ.update({"TONGYI_API_KEY": "benchmark", "TONGYI_API_ENDPOINT": endpoint})
+    from werkzeug.serving import make_server
+    import server
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    httpd = make_server('127.0.0.1', 0, server.app, threaded=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{httpd.server_port}"
+
+
+def sentences(count):
+    return [
+        {"id": f"s{i}", "messages": [
+            {"role": "system", "content": "Rewrite the sentence in natural English."},
+            {"role": "user", "content": f"Yesterday I go to the school and learn many knowledges {i}."}
+        ]}
+        for i in range(count)
+    ]
+
+
+def bench_sequential(base_url, items):
+    session = requests.Session()
+    start = time.perf_counter()
+    for item in items:
+        response = session.post(f"{base_url}/api/llm", json={
+            "provider": "tongyi", "messages": item["messages"], "stream": False
+        }, timeout=60)
+        response.raise_for_status()
+    return time.perf_counter() - start
+
+
+def bench_batch(base_url, items, parallelism):
+    start = time.perf_counter()
+    first_result = None
+    results = 0
+    with requests.post(f"{base_url}/api/llm/batch", json={
+        "provider": "tongyi", "items": items, "parallelism": parallelism
+    }, stream=True, timeout=300) as response:
+        for line in response.iter_lines():
+            if not line:
+                continue
+            if json.loads(line).get("type") == "summary":
+                continue
+            results += 1
+            if first_result is None:
+                first_result = time.perf_counter() - start
+    return time.perf_counter() - start, first_result, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量接口基准测试')
+    parser.add_argument('--items', type=int, default=40)
+    parser.add_argument('--parallelism', type=int, default=8)
+    parser.add_argument('--tokens', type=int, default=20)
+    parser.add_argument('--delay', type=float, default=0.01)
+    args = parser.parse_args()
+
+    _, endpoint = start_mock_upstream(tokens=args.tokens, delay=args.delay)
+    base_url = start_proxy(endpoint)
+    items = sentences(args.items)
+
+    sequential = bench_sequential(base_url, items)
+    batch, first_result, results = bench_batch(base_url, items, args.parallelism)
+
+    print(f"sequential: {args.items} 项, {sequential:.2f}s, {args.items / sequential:.1f} 项/秒")
+    print(f"     batch: {results} 项, {batch:.2f}s, {results / batch:.1f} 项/秒, "
+          f"首个结果 {first_result:.2f}s (parallelism={args.parallelism})")
+    print(f"   speedup: {sequential / batch:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
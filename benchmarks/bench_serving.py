@@ -0,0 +1,127 @@
+"""
+服务启动方式基准测试：开发服务器 (python server.py) vs Gunicorn多进程
+
+测量两项指标：
+  1. /api/health 的每秒请求数
+  2. 同时打开N个 /api/llm 流式响应时的完成数量和耗时
+
+上游LLM使用本地模拟服务（benchmarks/mock_llm_upstream.py），不会消耗真实token
+
+用法:
+    python benchmarks/bench_serving.py --duration 10 --concurrency 32 --streams 200
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from mock_llm_upstream import start_mock_upstream
+
+ROOT = Path(__file__).resolve().parent.parent
+PORT = 4399
+BASE_URL = f"http://127.0.0.1:{PORT}"
+
+LAUNCHERS = {
+    "dev-server": [sys.executable, "server.py"],
+    "gunicorn": [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "server:app"],
+}
+
+
+def wait_until_ready(timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{BASE_URL}/api/health", timeout=1).status_code == 200:
+                return True
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def bench_health_rps(duration, concurrency):
+    """在duration秒内用concurrency个线程持续请求健康检查"""
+    deadline = time.time() + duration
+
+    def worker():
+        session = requests.Session()
+        count = 0
+        while time.time() < deadline:
+            if session.get(f"{BASE_URL}/api/health", timeout=5).status_code == 200:
+                count += 1
+        return count
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        total = sum(pool.map(lambda _: worker(), range(concurrency)))
+    return total / duration
+
+
+def bench_concurrent_streams(streams):
+    """同时打开streams个流式请求，统计完整结束的数量"""
+    body = {
+        "provider": "tongyi",
+        "messages": [{"role": "user", "content": "hello"}],
+        "stream": True
+    }
+
+    def one_stream(_):
+        try:
+            with requests.post(f"{BASE_URL}/api/llm", json=body, stream=True, timeout=60) as resp:
+                for line in resp.iter_lines():
+                    if line == b"data: [DONE]":
+                        return True
+        except requests.exceptions.RequestException:
+            pass
+        return False
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=streams) as pool:
+        completed = sum(pool.map(one_stream, range(streams)))
+    return completed, time.time() - start
+
+
+def run_launcher(name, command, args, endpoint):
+    env = os.environ.copy()
+    env.update({
+        "TONGYI_API_KEY": "benchmark",
+        "TONGYI_API_ENDPOINT": endpoint,
+        "SERVER_ACCESS_LOG": "/dev/null",
+        "SERVER_BIND": f"127.0.0.1:{PORT}",
+    })
+    process = subprocess.Popen(command, cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_until_ready():
+            print(f"{name}: 启动失败")
+            return
+        rps = bench_health_rps(args.duration, args.concurrency)
+        completed, elapsed = bench_concurrent_streams(args.streams)
+        print(f"{name:>12}: health {rps:8.1f} req/s | "
+              f"streams {completed}/{args.streams} 完成, 耗时 {elapsed:.2f}s")
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='服务启动方式基准测试')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--streams', type=int, default=200)
+    parser.add_argument('--launcher', choices=list(LAUNCHERS), action='append')
+    args = parser.parse_args()
+
+    _, endpoint = start_mock_upstream(tokens=50, delay=0.02)
+    for name in args.launcher or LAUNCHERS:
+        run_launcher(name, LAUNCHERS[name], args, endpoint)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+本地模拟的OpenAI兼容LLM服务，供基准测试使用
+不访问任何外部网络，按固定间隔返回流式token
+
+用法:
+    python benchmarks/mock_llm_upstream.py --port 4500 --tokens 50 --delay 0.02
+然后设置 TONGYI_API_ENDPOINT=http://127.0.0.1:4500/v1/chat/completions
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_handler(tokens, delay):
+    class MockLLMHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length) or b'{}')
+
+            if not body.get('stream'):
+                time.sleep(delay * tokens)
+                payload = json.dumps({
+                    "choices": [{"message": {"role": "assistant", "content": "word " * tokens}}],
+                    "usage": {"completion_tokens": tokens}
+                }).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            try:
+                for i in range(tokens):
+                    chunk = {"choices": [{"index": 0, "delta": {"content": f"word{i}. " if i % 8 == 7 else f"word{i} "}}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+                    self.wfile.flush()
+                    time.sleep(delay)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            self.close_connection = True
+
+    return MockLLMHandler
+
+
+def start_mock_upstream(port=0, tokens=50, delay=0.02):
+    """在后台线程启动模拟服务，返回 (server, endpoint)"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(tokens, delay))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    endpoint = f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+    return server, endpoint
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='模拟LLM上游服务')
+    parser.add_argument('--port', type=int, default=4500)
+    parser.add_argument('--tokens', type=int, default=50)
+    parser.add_argument('--delay', type=float, default=0.02)
+    args = parser.parse_args()
+
+    server, endpoint = start_mock_upstream(args.port, args.tokens, args.delay)
+    print(f"模拟LLM服务已启动: {endpoint}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
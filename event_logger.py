@@ -0,0 +1,234 @@
+import os
+import sys
+import json
+import atexit
+import time
+import queue
+import random
+import threading
+
+
+class EventLogger:
+    """
+    结构化事件日志
+    请求线程只把事件放入有界队列（不阻塞、不格式化），由后台线程批量写入JSONL文件并按大小轮转
+    gunicorn下每个worker按固定的槽位编号写入自己的文件（events.w<N>.jsonl），被回收的worker由接替它的新worker
+    继续写同一个文件，日志总量始终受 worker数 × (backup_count + 1) × max_bytes 限制；
+    轮转前确认文件没有被其他进程（例如USR2平滑升级期间同槽位的旧worker）轮转过，避免重复轮转
+
+    使用方式:
+        event_logger.info('llm.request', provider='tongyi', messages=3)
+        event_logger.error('audio.decode_failed', error=e)
+        # 高频事件按比例采样，字段可以传入无参函数，在后台线程中才会计算
+        event_logger.info('llm.token', sample_rate=0.01, size=lambda: len(chunk))
+    """
+
+    LEVELS = {'debug': 10, 'info': 20, 'warning': 30, 'error': 40}
+
+    def __init__(self, log_dir='logs', filename='events.jsonl', max_bytes=10 * 1024 * 1024,
+                 backup_count=5, queue_size=10000, batch_size=256, flush_interval=0.5,
+                 level='info', echo_level='warning', sample_rates=None):
+        self.log_dir = log_dir
+        self.filename = filename
+        self.path = os.path.join(log_dir, filename)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.min_level = self.LEVELS.get(level, 20)
+        # 达到该级别的事件同时输出到标准错误，保持控制台可见
+        self.echo_level = self.LEVELS.get(echo_level, 30)
+        # 按事件名配置的默认采样率
+        self.sample_rates = dict(sample_rates or {})
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._file = None
+
+        self.written = 0
+        self.dropped = 0
+        self.sampled_out = 0
+        self.write_errors = 0
+
+        # gunicorn预加载应用后fork，子进程需要重新启动自己的写入线程
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+        # 进程正常退出时写完队列中剩余的事件（写入线程是daemon线程，不会自动等待）
+        atexit.register(self.stop)
+
+    def set_instance(self, name):
+        """
+        按实例名写入独立的文件：events.jsonl -> events.<name>.jsonl
+        需要在记录事件前调用（gunicorn在post_fork中以worker槽位调用）
+        """
+        stem, ext = os.path.splitext(self.filename)
+        self.path = os.path.join(self.log_dir, f"{stem}.{name}{ext}")
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._file = None
+        self.written = self.dropped = self.sampled_out = self.write_errors = 0
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='event-logger', daemon=True)
+                self._thread.start()
+
+    def log(self, level, event, sample_rate=None, **fields):
+        """
+        记录一个事件，永不阻塞调用线程
+        队列已满时直接丢弃并计数
+        """
+        level_value = self.LEVELS.get(level, 20)
+        if level_value < self.min_level:
+            return
+
+        if sample_rate is None:
+            sample_rate = self.sample_rates.get(event, 1.0)
+        if sample_rate < 1.0 and random.random() >= sample_rate:
+            self.sampled_out += 1
+            return
+
+        if self._thread is None:
+            self._ensure_started()
+
+        try:
+            self._queue.put_nowait((time.time(), level, level_value, event, sample_rate, fields))
+        except queue.Full:
+            self.dropped += 1
+
+    def debug(self, event, **fields):
+        self.log('debug', event, **fields)
+
+    def info(self, event, **fields):
+        self.log('info', event, **fields)
+
+    def warning(self, event, **fields):
+        self.log('warning', event, **fields)
+
+    def error(self, event, **fields):
+        self.log('error', event, **fields)
+
+    def _format(self, item):
+        """在后台线程中完成字段计算和序列化"""
+        timestamp, level, _, event, sample_rate, fields = item
+        record = {
+            "ts": round(timestamp, 6),
+            "level": level,
+            "event": event,
+            "pid": os.getpid()
+        }
+        if sample_rate < 1.0:
+            record["sample_rate"] = sample_rate
+        for key, value in fields.items():
+            if callable(value):
+                try:
+                    value = value()
+                except Exception as e:
+                    value = f"<字段计算失败: {e}>"
+            if isinstance(value, BaseException):
+                value = f"{type(value).__name__}: {value}"
+            record[key] = value
+        return json.dumps(record, ensure_ascii=False, default=str)
+
+    def _run(self):
+        while not self._stop_event.is_set() or not self._queue.empty():
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        lines = []
+        for item in batch:
+            try:
+                line = self._format(item)
+            except Exception:
+                self.write_errors += 1
+                continue
+            lines.append(line)
+            if item[2] >= self.echo_level:
+                print(line, file=sys.stderr)
+        if not lines:
+            return
+
+        try:
+            if self._file is not None and self._file_replaced():
+                # 文件已被其他进程轮转，改写新文件
+                self._file.close()
+                self._file = None
+            if self._file is None:
+                os.makedirs(self.log_dir, exist_ok=True)
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write('\n'.join(lines) + '\n')
+            self._file.flush()
+            self.written += len(lines)
+            if self._file.tell() >= self.max_bytes:
+                self._rotate()
+        except OSError:
+            self.write_errors += len(lines)
+
+    def _file_replaced(self):
+        """当前打开的文件是否已不是self.path（被其他进程轮转或删除）"""
+        try:
+            return os.stat(self.path).st_ino != os.fstat(self._file.fileno()).st_ino
+        except FileNotFoundError:
+            return True
+
+    def _rotate(self):
+        """events.jsonl -> events.jsonl.1 -> ... -> events.jsonl.N"""
+        replaced = self._file_replaced()
+        self._file.close()
+        self._file = None
+        if replaced:
+            return
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def stop(self, timeout=5):
+        """写完队列中剩余的事件后停止后台线程，可重复调用"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self._file is not None and (self._thread is None or not self._thread.is_alive()):
+            self._file.close()
+            self._file = None
+
+    def get_stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "sampled_out": self.sampled_out,
+            "write_errors": self.write_errors,
+            "file": self.path
+        }
+
+
+# 全局事件日志实例
+event_logger = EventLogger(
+    log_dir=os.getenv('EVENT_LOG_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')),
+    level=os.getenv('EVENT_LOG_LEVEL', 'info'),
+    sample_rates={
+        'llm.token': float(os.getenv('EVENT_LOG_TOKEN_SAMPLE_RATE', '0.01')),
+        'audio.frame': float(os.getenv('EVENT_LOG_FRAME_SAMPLE_RATE', '0.01'))
+    }
+)
@@ -0,0 +1,94 @@
+"""
+Gunicorn生产环境配置
+启动命令: gunicorn -c gunicorn.conf.py server:app
+（或使用 python start-backend.py --production）
+
+所有参数都可以通过环境变量覆盖，见下方各项说明
+"""
+
+import os
+import signal
+import itertools
+import multiprocessing
+
+# 监听地址
+bind = os.getenv('SERVER_BIND', '0.0.0.0:4399')
+
+# worker数量：默认按CPU核数计算
+# 同时把数量写回环境变量，server.py据此决定SocketIO的传输方式
+workers = int(os.getenv('SERVER_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+os.environ['SERVER_WORKERS'] = str(workers)
+
+# 使用线程worker：SSE长连接占用线程而不是进程，
+# 并且Flask-SocketIO可以通过simple-websocket在线程模式下提供WebSocket
+worker_class = 'gthread'
+threads = int(os.getenv('SERVER_THREADS', '32'))
+worker_connections = int(os.getenv('SERVER_WORKER_CONNECTIONS', '1000'))
+
+# fork前预加载应用，worker共享只读内存并且启动更快
+# 注意：预加载后HUP只会从主进程已加载的代码fork新worker，仅重新读取本配置文件；
+# 更新代码需要 kill -USR2 <master pid> 启动新的主进程，新worker就绪后再 kill -TERM 旧主进程
+# （或先 kill -WINCH 旧主进程平滑停止其worker）。不要对旧主进程使用QUIT：QUIT是快速退出，
+# worker会被立即终止，进行中的SSE流被直接切断
+preload_app = True
+
+# keep-alive需要大于前置负载均衡的空闲超时（nginx默认60秒）
+keepalive = int(os.getenv('SERVER_KEEPALIVE', '75'))
+
+# worker心跳超时；gthread下由主线程发送心跳，长时间的流式响应不会触发
+timeout = int(os.getenv('SERVER_TIMEOUT', '120'))
+
+# 平滑重启/退出（HUP、WINCH、TERM）时旧worker等待进行中SSE流结束的最长时间
+graceful_timeout = int(os.getenv('SERVER_GRACEFUL_TIMEOUT', '90'))
+
+# 定期回收worker，防止长期运行的内存增长
+max_requests = int(os.getenv('SERVER_MAX_REQUESTS', '5000'))
+max_requests_jitter = int(os.getenv('SERVER_MAX_REQUESTS_JITTER', '500'))
+
+accesslog = os.getenv('SERVER_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.getenv('SERVER_LOG_LEVEL', 'info')
+
+
+def pre_fork(server, worker):
+    """
+    在主进程中给新worker分配固定的槽位编号：被回收或异常退出的worker的编号由接替它的新worker复用，
+    事件日志按槽位命名文件，文件数量不随worker回收增长
+    """
+    used = {getattr(existing, 'slot', None) for existing in server.WORKERS.values()}
+    worker.slot = next(slot for slot in itertools.count() if slot not in used)
+
+
+def post_fork(server, worker):
+    from event_logger import event_logger
+
+    event_logger.set_instance(f"w{worker.slot}")
+
+
+def post_worker_init(worker):
+    """
+    worker初始化完成后接管SIGTERM：
+    先标记排空状态（健康检查返回503），再交给gunicorn的平滑退出流程，
+    gthread worker会在graceful_timeout内等待进行中的请求完成
+    """
+    from server import stream_tracker
+
+    original_handle_exit = worker.handle_exit
+
+    def handle_exit(sig, frame):
+        stream_tracker.begin_drain()
+        original_handle_exit(sig, frame)
+
+    signal.signal(signal.SIGTERM, handle_exit)
+
+
+def worker_exit(server, worker):
+    """记录退出时仍未结束的流式响应，并写完事件日志队列中剩余的事件"""
+    from server import stream_tracker
+    from event_logger import event_logger
+
+    if stream_tracker.active:
+        server.log.warning(
+            "worker %s 退出时仍有 %d 个流式响应未结束", worker.pid, stream_tracker.active
+        )
+    event_logger.stop()
@@ -0,0 +1,196 @@
+import re
+import threading
+from functools import lru_cache
+
+
+# 中日韩字符按每字一个token估算，英文按单词/标点估算，长单词额外计入子词
+_CJK_PATTERN = re.compile(r'[぀-ヿ㐀-䶿一-鿿가-힯＀-￯　-〿]')
+_WORD_PATTERN = re.compile(r'[A-Za-z]+|\d+|[^\sA-Za-z\d]')
+_SENTENCE_END_PATTERN = re.compile(r'(?<=[.!?。！？])\s')
+
+# 每条消息的格式开销（角色标记等）
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@lru_cache(maxsize=8192)
+def estimate_tokens(text):
+    """
+    快速估算文本的token数量
+    不依赖具体模型的分词器，结果偏保守，用于预算控制足够
+    """
+    if not text:
+        return 0
+    cjk_count = len(_CJK_PATTERN.findall(text))
+    rest = _CJK_PATTERN.sub(' ', text)
+    count = cjk_count
+    for word in _WORD_PATTERN.findall(rest):
+        if word.isdigit():
+            count += (len(word) + 2) // 3
+        else:
+            count += 1 + (len(word) - 1) // 6
+    return count
+
+
+def estimate_message_tokens(message):
+    content = message.get('content')
+    if not isinstance(content, str):
+        content = str(content or '')
+    return estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+
+@lru_cache(maxsize=4096)
+def summarize_message(role, content, max_chars=120):
+    """
+    将一条历史消息压缩成一行摘要：只保留第一句，并限制长度
+    结果会被缓存，每条消息只在第一次被移出预算时处理一次
+    """
+    text = ' '.join(content.split())
+    first_sentence = _SENTENCE_END_PATTERN.split(text, maxsplit=1)[0]
+    if len(first_sentence) > max_chars:
+        first_sentence = first_sentence[:max_chars].rstrip() + '…'
+    label = '用户' if role == 'user' else '助手'
+    return f"{label}: {first_sentence}"
+
+
+class HistoryCompactor:
+    """
+    按token预算压缩对话历史
+    保留系统提示词和当前用户输入，从最近的对话开始尽量完整保留，
+    超出预算的早期对话替换为滚动摘要（附加在系统提示词之后）
+    """
+
+    SUMMARY_HEADER = "以下是更早对话的摘要（仅供参考上下文）："
+
+    def __init__(self, summary_ratio=0.2):
+        # 摘要最多占用预算的比例
+        self.summary_ratio = summary_ratio
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.compacted_requests = 0
+        self.tokens_removed_total = 0
+        self.last_tokens_removed = 0
+
+    def _split_turns(self, history):
+        """把历史消息按"用户消息 + 后续回复"分组，保证不会拆开一轮对话"""
+        turns = []
+        for message in history:
+            if message.get('role') == 'user' or not turns:
+                turns.append([message])
+            else:
+                turns[-1].append(message)
+        return turns
+
+    def _build_summary(self, dropped, budget):
+        """从最新的被移除消息开始往前拼接摘要，直到达到摘要预算"""
+        lines = []
+        used = estimate_tokens(self.SUMMARY_HEADER)
+        for message in reversed(dropped):
+            content = message.get('content')
+            if not isinstance(content, str) or not content.strip():
+                continue
+            line = summarize_message(message.get('role', 'user'), content)
+            cost = estimate_tokens(line) + 1
+            if used + cost > budget:
+                break
+            lines.append(line)
+            used += cost
+        if not lines:
+            return None
+        lines.reverse()
+        return self.SUMMARY_HEADER + "\n" + "\n".join(lines)
+
+    def compact(self, messages, budget):
+        """
+        将消息数组压缩到预算以内
+
+        Args:
+            messages: OpenAI格式的消息数组
+            budget: 提示词token预算
+
+        Returns:
+            tuple: (压缩后的消息数组, 统计信息)
+        """
+        original_tokens = sum(estimate_message_tokens(m) for m in messages)
+        stats = {
+            "original_tokens": original_tokens,
+            "compacted_tokens": original_tokens,
+            "tokens_removed": 0,
+            "summarized_messages": 0
+        }
+
+        if not budget or original_tokens <= budget or len(messages) < 3:
+            self._record(stats)
+            return messages, stats
+
+        # 拆分：开头的系统提示词 / 中间的历史 / 最后一条当前输入
+        head_count = 0
+        while head_count < len(messages) - 1 and messages[head_count].get('role') == 'system':
+            head_count += 1
+        system_messages = list(messages[:head_count])
+        history = messages[head_count:-1]
+        current = messages[-1]
+
+        fixed_tokens = sum(estimate_message_tokens(m) for m in system_messages)
+        fixed_tokens += estimate_message_tokens(current)
+        summary_budget = int(budget * self.summary_ratio)
+        history_budget = budget - fixed_tokens - summary_budget
+
+        # 从最近的一轮开始保留完整对话
+        kept_turns = []
+        used = 0
+        turns = self._split_turns(history)
+        for turn in reversed(turns):
+            cost = sum(estimate_message_tokens(m) for m in turn)
+            if used + cost > history_budget:
+                break
+            kept_turns.append(turn)
+            used += cost
+        kept_turns.reverse()
+
+        dropped = [m for turn in turns[:len(turns) - len(kept_turns)] for m in turn]
+        if not dropped:
+            self._record(stats)
+            return messages, stats
+
+        summary = self._build_summary(dropped, summary_budget)
+        if summary:
+            if system_messages:
+                first = dict(system_messages[0])
+                first['content'] = f"{first.get('content', '')}\n\n{summary}"
+                system_messages[0] = first
+            else:
+                system_messages = [{"role": "system", "content": summary}]
+
+        compacted = system_messages + [m for turn in kept_turns for m in turn] + [current]
+        compacted_tokens = sum(estimate_message_tokens(m) for m in compacted)
+        stats.update({
+            "compacted_tokens": compacted_tokens,
+            "tokens_removed": max(0, original_tokens - compacted_tokens),
+            "summarized_messages": len(dropped)
+        })
+        self._record(stats)
+        return compacted, stats
+
+    def _record(self, stats):
+        with self._lock:
+            self.requests += 1
+            self.last_tokens_removed = stats["tokens_removed"]
+            if stats["tokens_removed"]:
+                self.compacted_requests += 1
+                self.tokens_removed_total += stats["tokens_removed"]
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "compacted_requests": self.compacted_requests,
+                "tokens_removed_total": self.tokens_removed_total,
+                "tokens_removed_avg": round(self.tokens_removed_total / self.requests, 1) if self.requests else 0,
+                "last_tokens_removed": self.last_tokens_removed,
+                "token_cache": estimate_tokens.cache_info()._asdict(),
+                "summary_cache": summarize_message.cache_info()._asdict()
+            }
+
+
+# 全局历史压缩器实例
+history_compactor = HistoryCompactor()
@@ -0,0 +1,183 @@
+import os
+import sys
+import hmac
+import time
+import uuid
+import threading
+from collections import Counter
+from event_logger import event_logger
+
+
+class ProfileSession:
+    """对单个请求线程的一次采样"""
+
+    def __init__(self, thread_ident, label, interval, max_duration):
+        self.id = uuid.uuid4().hex[:12]
+        self.thread_ident = thread_ident
+        self.label = label
+        self.interval = interval
+        self.max_duration = max_duration
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_at = time.time()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'profiler-{self.id}', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread.join(timeout=1)
+
+    def _run(self):
+        deadline = self.started_at + self.max_duration
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_ident)
+            if frame is None or time.time() > deadline:
+                return
+            self.stacks[self._collapse(frame)] += 1
+            self.samples += 1
+
+    @staticmethod
+    def _collapse(frame):
+        """把调用栈转换为flamegraph的折叠格式：根在前，以分号分隔"""
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        names.reverse()
+        return ';'.join(name.replace(';', ':') for name in names)
+
+    def to_collapsed(self):
+        return '\n'.join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + '\n'
+
+
+class RequestProfiler:
+    """
+    按需的请求级采样分析器
+    默认关闭；配置PROFILER_TOKEN后，可以通过以下两种方式为匹配的请求开启采样：
+      1. 请求头 X-Profile-Token: <token>
+      2. 管理接口预约接下来的N个匹配请求
+    采样结果以flamegraph折叠格式写入本地目录，可直接用 flamegraph.pl / speedscope 查看
+
+    预约状态只属于当前进程：多worker部署时，预约只对处理该管理请求的worker生效，
+    状态中返回pid以便区分；需要覆盖所有worker时请改用请求头方式
+    """
+
+    def __init__(self, output_dir='profiles', token=None, max_hz=100, default_hz=50,
+                 max_concurrent=2, max_duration=120, path_prefixes=('/api/llm', '/api/speech/')):
+        self.output_dir = output_dir
+        self.token = token
+        self.max_hz = max_hz
+        self.default_hz = default_hz
+        self.max_concurrent = max_concurrent
+        self.max_duration = max_duration
+        self.path_prefixes = tuple(path_prefixes)
+
+        self._lock = threading.Lock()
+        self.active = 0
+        self.armed_requests = 0
+        self.armed_prefix = None
+        self.armed_hz = default_hz
+        self.completed = 0
+        self.skipped_busy = 0
+        self.recent_files = []
+
+    @property
+    def enabled(self):
+        return bool(self.token)
+
+    def check_token(self, value):
+        # compare_digest对非ASCII的str会抛出TypeError，统一按UTF-8字节比较
+        return (self.enabled and bool(value)
+                and hmac.compare_digest(value.encode('utf-8'), self.token.encode('utf-8')))
+
+    def arm(self, requests=1, path_prefix=None, hz=None):
+        """预约接下来的若干个匹配请求进行采样"""
+        with self._lock:
+            self.armed_requests = max(0, int(requests))
+            self.armed_prefix = path_prefix
+            self.armed_hz = min(int(hz or self.default_hz), self.max_hz)
+        return self.get_stats()
+
+    def _matches(self, path, prefix=None):
+        if prefix:
+            return path.startswith(prefix)
+        return path.startswith(self.path_prefixes)
+
+    def maybe_start(self, path, headers):
+        """
+        请求开始时调用，需要采样时启动并返回ProfileSession，否则返回None
+        采样的是调用该方法的线程（即处理该请求的线程）
+        """
+        if not self.enabled or not self._matches(path):
+            return None
+
+        hz = None
+        with self._lock:
+            if self.check_token(headers.get('X-Profile-Token')):
+                hz = headers.get('X-Profile-Hz', self.default_hz)
+            elif self.armed_requests > 0 and self._matches(path, self.armed_prefix):
+                self.armed_requests -= 1
+                hz = self.armed_hz
+            if hz is None:
+                return None
+            if self.active >= self.max_concurrent:
+                self.skipped_busy += 1
+                return None
+            self.active += 1
+
+        try:
+            hz = min(max(int(hz), 1), self.max_hz)
+        except (TypeError, ValueError):
+            hz = self.default_hz
+        label = path.strip('/').replace('/', '_') or 'root'
+        session = ProfileSession(threading.get_ident(), label, 1.0 / hz, self.max_duration)
+        session.start()
+        return session
+
+    def finish(self, session):
+        """请求结束（响应关闭）时调用，停止采样并写入文件"""
+        session.stop()
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            filename = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(session.started_at))}-{session.label}-{session.id}.folded"
+            path = os.path.join(self.output_dir, filename)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(session.to_collapsed())
+            event_logger.info('profiler.saved', profile_id=session.id, file=path,
+                              samples=session.samples,
+                              duration_ms=round((time.time() - session.started_at) * 1000, 1))
+        except OSError as e:
+            path = None
+            event_logger.error('profiler.save_failed', profile_id=session.id, error=e)
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.completed += 1
+                if path:
+                    self.recent_files = (self.recent_files + [path])[-20:]
+
+    def get_stats(self):
+        return {
+            "pid": os.getpid(),
+            "enabled": self.enabled,
+            "active": self.active,
+            "armed_requests": self.armed_requests,
+            "armed_prefix": self.armed_prefix,
+            "armed_hz": self.armed_hz,
+            "max_hz": self.max_hz,
+            "completed": self.completed,
+            "skipped_busy": self.skipped_busy,
+            "recent_files": list(self.recent_files)
+        }
+
+
+# 全局请求采样分析器实例
+request_profiler = RequestProfiler(
+    output_dir=os.getenv('PROFILER_OUTPUT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles')),
+    token=os.getenv('PROFILER_TOKEN'),
+    max_hz=int(os.getenv('PROFILER_MAX_HZ', '100'))
+)
@@ -0,0 +1,159 @@
+import re
+
+
+class IncrementalSentenceSegmenter:
+    """
+    增量分句器
+    逐段输入LLM的流式增量文本，每当形成一个完整句子就立即返回，
+    用于在模型仍在生成时提前开始语音合成
+
+    处理规则：
+      - 英文句末标点后需要跟空白才算句子结束（排除小数、网址等）
+      - 常见缩写（Mr. / e.g. 等）、单字母加句点的缩写（U.S. / a.m.）、单个大写字母缩写（代词I除外）和有序列表序号不断句
+      - 省略号（...）视为句末标点
+      - 与常用词同形的缩写区分大小写（Co. / Mar.），No. 只在后面跟数字时才视为缩写
+      - 中文句末标点直接断句
+      - 换行视为句子边界（markdown标题、列表项各自成句）
+      - 代码块内容不朗读，输出的句子去掉markdown标记
+    """
+
+    TERMINALS = '.!?;'
+    CJK_TERMINALS = '。！？；'
+    CLOSERS = '"\'”’)]}）】》*_`'
+
+    # 不区分大小写匹配，只收录不会与常用词混淆的缩写
+    ABBREVIATIONS = {
+        'mr', 'mrs', 'ms', 'dr', 'prof', 'sr', 'jr', 'st', 'vs', 'etc',
+        'eg', 'ie', 'pm', 'fig', 'approx', 'inc', 'ltd', 'dept', 'est',
+        'vol', 'mt', 'ave', 'jan', 'feb', 'apr', 'jun', 'jul', 'aug',
+        'sep', 'sept', 'oct', 'nov', 'dec'
+    }
+    # 与常用词同形（co / mar），只按原大小写匹配
+    CASE_SENSITIVE_ABBREVIATIONS = {'Co', 'Mar'}
+    # 编号缩写（No. 5），后面跟数字时才不断句
+    NUMBER_ABBREVIATIONS = {'no', 'nos'}
+
+    _LAST_WORD_PATTERN = re.compile(r'([A-Za-z][A-Za-z.]*)\.$')
+    _DOTTED_ABBREVIATION_PATTERN = re.compile(r'^(?:[A-Za-z]\.)+[A-Za-z]$')
+    _LIST_NUMBER_PATTERN = re.compile(r'^\s*(?:[-*+]\s+)?\d+\.$')
+    _LINK_PATTERN = re.compile(r'!?\[([^\]]*)\]\([^)]*\)')
+    _LINE_PREFIX_PATTERN = re.compile(r'^\s*(?:#{1,6}\s+|>\s*|[-*+]\s+|\d+[.)]\s+)+')
+    _MARKUP_PATTERN = re.compile(r'(\*\*|__|\*|`|~~)')
+    _SPEAKABLE_PATTERN = re.compile(r'[A-Za-z0-9一-鿿]')
+
+    def __init__(self):
+        self.buffer = ''
+        self.in_code_block = False
+        # 句末标点之后等待下一个字符来确认是否断句
+        self.pending_end = None
+        self.pending_cjk = False
+        # 句点属于编号缩写时，要等到下一个非空白字符才能确定是否断句
+        self.pending_number = False
+        self.count = 0
+
+    def feed(self, text):
+        """输入一段增量文本，返回本次新形成的完整句子列表"""
+        sentences = []
+        for char in text:
+            if char == '\n':
+                self._end_line(sentences)
+                continue
+
+            if self.in_code_block:
+                self.buffer += char
+                continue
+
+            if self.pending_number:
+                if char.isspace():
+                    self.buffer += char
+                    continue
+                if not char.isdigit():
+                    self._emit(self.buffer[:self.pending_end], sentences)
+                    self.buffer = self.buffer[self.pending_end:].lstrip()
+                self.pending_end = None
+                self.pending_number = False
+            elif self.pending_end is not None:
+                if char in self.CLOSERS:
+                    self.buffer += char
+                    self.pending_end = len(self.buffer)
+                    continue
+                if char.isspace() or self.pending_cjk:
+                    self._emit(self.buffer[:self.pending_end], sentences)
+                    self.buffer = self.buffer[self.pending_end:].lstrip()
+                self.pending_end = None
+                self.pending_cjk = False
+
+            self.buffer += char
+
+            if char in self.CJK_TERMINALS:
+                self.pending_end = len(self.buffer)
+                self.pending_cjk = True
+            elif char in self.TERMINALS:
+                kind = self._abbreviation_kind()
+                if kind != 'abbreviation':
+                    self.pending_end = len(self.buffer)
+                    self.pending_number = kind == 'number'
+        return sentences
+
+    def flush(self):
+        """输入结束，返回缓冲区中剩余的最后一句"""
+        sentences = []
+        if not self.in_code_block:
+            self._emit(self.buffer, sentences)
+        self.buffer = ''
+        self.pending_end = None
+        self.pending_cjk = False
+        self.pending_number = False
+        self.in_code_block = False
+        return sentences
+
+    def _end_line(self, sentences):
+        line = self.buffer.strip()
+        if line.startswith('```') or line.startswith('~~~'):
+            self.in_code_block = not self.in_code_block
+        elif not self.in_code_block:
+            self._emit(self.buffer, sentences)
+        self.buffer = ''
+        self.pending_end = None
+        self.pending_cjk = False
+        self.pending_number = False
+
+    def _abbreviation_kind(self):
+        """
+        判断缓冲区末尾的句点是否属于缩写或列表序号
+        返回 'abbreviation'（不断句）、'number'（后面跟数字时不断句）或None（断句）
+        """
+        if not self.buffer.endswith('.'):
+            return None
+        if self.buffer.endswith('..'):
+            return None
+        if self._LIST_NUMBER_PATTERN.match(self.buffer):
+            return 'abbreviation'
+        match = self._LAST_WORD_PATTERN.search(self.buffer)
+        if not match:
+            return None
+        word = match.group(1)
+        if (len(word) == 1 and word.isupper() and word != 'I') or self._DOTTED_ABBREVIATION_PATTERN.match(word):
+            return 'abbreviation'
+        if word in self.CASE_SENSITIVE_ABBREVIATIONS or word.lower() in self.ABBREVIATIONS:
+            return 'abbreviation'
+        if word.lower() in self.NUMBER_ABBREVIATIONS:
+            return 'number'
+        return None
+
+    def _emit(self, text, sentences):
+        cleaned = self.clean(text)
+        if cleaned:
+            sentences.append(cleaned)
+            self.count += 1
+
+    @classmethod
+    def clean(cls, text):
+        """去掉markdown标记，返回适合朗读的文本；没有可朗读内容时返回空字符串"""
+        text = cls._LINK_PATTERN.sub(r'\1', text)
+        text = cls._LINE_PREFIX_PATTERN.sub('', text)
+        text = cls._MARKUP_PATTERN.sub('', text)
+        text = ' '.join(text.split())
+        if not cls._SPEAKABLE_PATTERN.search(text):
+            return ''
+        return text
@@ -1,9 +1,20 @@
-from flask import Flask, request, jsonify, Response, stream_with_context, send_from_directory
+from flask import Flask, request, jsonify, Response, stream_with_context, abort, g, send_file
 from flask_cors import CORS
 import requests
 import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
+from static_assets import static_assets
+from history_compactor import history_compactor
+from sentence_segmenter import IncrementalSentenceSegmenter
+from event_logger import event_logger
+from speculative_turns import SpeculativeTurnManager
+from request_profiler import request_profiler
+from audio_blob_store import audio_blob_store
 
 # 加载环境变量
 load_dotenv()
@@ -11,26 +22,54 @@ load_dotenv()
 app = Flask(__name__)
 CORS(app)  # 允许跨域请求
 
+# 启动时预先加载并压缩前端静态资源
+static_assets.build()
+
+@app.before_request
+def start_request_profiling():
+    """
+    按需对匹配的请求进行采样分析（需配置PROFILER_TOKEN）
+    """
+    session = request_profiler.maybe_start(request.path, request.headers)
+    if session is not None:
+        g.profile_session = session
+
+@app.after_request
+def finish_request_profiling(response):
+    """
+    流式响应在生成器结束后才算处理完，因此在响应关闭时停止采样
+    """
+    session = g.pop('profile_session', None)
+    if session is not None:
+        response.headers['X-Profile-Id'] = session.id
+        response.call_on_close(lambda: request_profiler.finish(session))
+    return response
+
 # 静态文件和首页路由
 @app.route('/')
 def index():
     """
     首页路由 - 返回主页面
     """
-    return send_from_directory('.', 'index.html')
+    return static_files('index.html')
 
 @app.route('/<path:filename>')
 def static_files(filename):
     """
-    静态文件路由 - 服务CSS、JS等静态资源
+    静态文件路由 - 从内存缓存服务JS等前端资源
+    只提供白名单内的资源，支持gzip/brotli和ETag条件请求
     """
-    return send_from_directory('.', filename)
+    response = static_assets.serve(filename, request, auto_reload=app.debug)
+    if response is None:
+        abort(404)
+    return response
 
 # 语音功能相关导入
 try:
-    from websocket_handler import sts_api_handler, create_sts_socketio_handler
+    from websocket_handler import sts_api_handler, create_sts_socketio_handler, create_asr_gateway_socketio_handler
     from audio_processor import audio_processor
     from speech_service import sts_session_manager
+    from asr_gateway import asr_gateway
     SPEECH_AVAILABLE = True
 except ImportError as e:
     print(f"⚠️ 语音功能模块导入失败: {e}")
@@ -40,105 +79,488 @@ except ImportError as e:
 API_CONFIGS = {
     "tongyi": {
         "name": "通义千问",
-        "endpoint": "https://dashscope.aliyuncs.com/compatible-mode/v1/chat/completions",
+        "endpoint": os.getenv('TONGYI_API_ENDPOINT', "https://dashscope.aliyuncs.com/compatible-mode/v1/chat/completions"),
         "model": "qwen-plus",
-        "api_key": os.getenv('TONGYI_API_KEY')
+        "api_key": os.getenv('TONGYI_API_KEY'),
+        # 提示词token预算，超出部分的早期对话会被压缩为摘要
+        "context_budget": int(os.getenv('TONGYI_CONTEXT_BUDGET', '6000')),
+        # 流式响应中断后续写：在assistant前缀消息上标记的字段
+        "continuation_field": "partial"
     },
     "deepseek": {
         "name": "DeepSeek",
-        "endpoint": "https://api.deepseek.com/v1/chat/completions", 
+        "endpoint": os.getenv('DEEPSEEK_API_ENDPOINT', "https://api.deepseek.com/v1/chat/completions"),
         "model": "deepseek-chat",
-        "api_key": os.getenv('DEEPSEEK_API_KEY')
+        "api_key": os.getenv('DEEPSEEK_API_KEY'),
+        "context_budget": int(os.getenv('DEEPSEEK_CONTEXT_BUDGET', '6000')),
+        # DeepSeek的前缀续写只在beta接口上提供
+        "continuation_field": "prefix",
+        "continuation_endpoint": os.getenv('DEEPSEEK_CONTINUATION_ENDPOINT', "https://api.deepseek.com/beta/chat/completions")
     }
 }
 
+# 流式响应中断后最多的续写恢复次数（先同一提供商，再依次尝试其他已配置的提供商）
+STREAM_MAX_RECOVERIES = int(os.getenv('STREAM_MAX_RECOVERIES', '2'))
+# 可以通过重新请求恢复的上游状态码
+RECOVERABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class StreamTracker:
+    """
+    跟踪进行中的SSE流式响应
+    平滑重启时先进入排空状态，等待已有的流式回复结束
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.active = 0
+        self.draining = False
+        self.completed = 0
+        self.cancelled = 0
+        self.recovered = 0
+        self.tokens_preserved = 0
+        self.tokens_streamed_before_cancel = 0
+        self.tokens_saved_estimate = 0
+        # 正常完成的流的总token数，用于估算被取消的流原本还会生成多少
+        self.completed_tokens = 0
+
+    def opened(self):
+        with self._lock:
+            self.active += 1
+
+    def closed(self):
+        with self._lock:
+            self.active -= 1
+
+    def record_completed(self, tokens_streamed):
+        with self._lock:
+            self.completed += 1
+            self.completed_tokens += tokens_streamed
+
+    def record_recovered(self, tokens_preserved):
+        """记录中断后通过续写恢复的流，tokens_preserved为无需重新生成的token数"""
+        with self._lock:
+            self.recovered += 1
+            self.tokens_preserved += tokens_preserved
+
+    def record_cancelled(self, tokens_streamed, max_tokens):
+        """
+        记录被客户端中断的流
+        节省的token按已完成流的平均长度（不超过max_tokens）减去已生成数量估算，
+        还没有完成过的流时无法估算，只计入已生成数量
+        """
+        with self._lock:
+            self.cancelled += 1
+            self.tokens_streamed_before_cancel += tokens_streamed
+            if self.completed:
+                expected = min(self.completed_tokens / self.completed, max_tokens or float('inf'))
+                self.tokens_saved_estimate += max(0, round(expected - tokens_streamed))
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "active": self.active,
+                "completed": self.completed,
+                "cancelled": self.cancelled,
+                "recovered": self.recovered,
+                "tokens_preserved": self.tokens_preserved,
+                "tokens_streamed_before_cancel": self.tokens_streamed_before_cancel,
+                "tokens_saved_estimate": self.tokens_saved_estimate,
+                "avg_completed_tokens": round(self.completed_tokens / self.completed, 1) if self.completed else None
+            }
+
+    def begin_drain(self):
+        """进入排空状态，健康检查返回503以便负载均衡摘除该进程"""
+        with self._lock:
+            self.draining = True
+
+stream_tracker = StreamTracker()
+
+# 复用到LLM服务的HTTP连接，流被中断时连接会被及时释放
+llm_session = requests.Session()
+llm_session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=64))
+llm_session.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=64))
+
+# 基于语音识别中间结果的推测生成
+# 推测结果只保存在进程内存中，多worker部署时推测请求和最终请求大多落在不同进程，因此只在单进程时启用
+speculative_turns = SpeculativeTurnManager(
+    llm_session,
+    enabled=int(os.getenv('SERVER_WORKERS', '1')) == 1,
+    min_stable_ms=int(os.getenv('SPECULATION_MIN_STABLE_MS', '600'))
+)
+
+# 批量接口的并发上限：单个批次的默认/最大并发，以及所有批次共享的上游并发
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', '200'))
+BATCH_DEFAULT_PARALLELISM = int(os.getenv('BATCH_DEFAULT_PARALLELISM', '4'))
+BATCH_MAX_PARALLELISM = int(os.getenv('BATCH_MAX_PARALLELISM', '16'))
+batch_upstream_slots = threading.BoundedSemaphore(int(os.getenv('BATCH_GLOBAL_CONCURRENCY', '32')))
+
+def parse_stream_chunk(line_str):
+    """
+    解析一行SSE数据（OpenAI兼容格式）
+    
+    Returns:
+        tuple: (增量文本, finish_reason)，没有时分别为空字符串和None
+    """
+    payload = line_str[len('data: '):]
+    if payload == '[DONE]':
+        return '', None
+    try:
+        choices = json.loads(payload).get('choices') or []
+    except (ValueError, AttributeError):
+        return '', None
+    if not choices:
+        return '', None
+    choice = choices[0]
+    return (choice.get('delta') or {}).get('content') or '', choice.get('finish_reason')
+
+def parse_stream_delta(line_str):
+    """
+    从一行SSE数据中取出增量文本（OpenAI兼容格式），无内容时返回空字符串
+    """
+    return parse_stream_chunk(line_str)[0]
+
+class UpstreamStreamError(ConnectionError):
+    """上游流式响应在结束前中断"""
+
+def recovery_targets(provider):
+    """
+    流中断后依次尝试的提供商：先同一提供商，再其他已配置密钥的提供商
+    """
+    alternates = [key for key, config in API_CONFIGS.items() if key != provider and config['api_key']]
+    return ([provider] + alternates)[:STREAM_MAX_RECOVERIES]
+
+def build_continuation_call(provider, request_data, partial_text, tokens_streamed):
+    """
+    构建续写请求：把已生成的内容作为assistant前缀，只让模型生成剩余部分
+    没有已生成内容时等同于原样重试
+    
+    Returns:
+        tuple: (endpoint, 请求参数, 请求头)
+    """
+    config = API_CONFIGS[provider]
+    continuation = dict(request_data, model=config['model'])
+    endpoint = config['endpoint']
+    
+    if partial_text:
+        continuation['messages'] = list(request_data['messages']) + [{
+            "role": "assistant",
+            "content": partial_text,
+            config['continuation_field']: True
+        }]
+        continuation['max_tokens'] = max(1, request_data.get('max_tokens', 2000) - tokens_streamed)
+        endpoint = config.get('continuation_endpoint', endpoint)
+    
+    headers = {
+        "Authorization": f"Bearer {config['api_key']}",
+        "Content-Type": "application/json"
+    }
+    return endpoint, continuation, headers
+
+def prepare_llm_call(data):
+    """
+    校验请求数据并构建上游LLM调用参数
+    
+    Returns:
+        tuple: (调用参数dict, None) 或 (None, (错误响应, 状态码))
+    """
+    # 验证必要参数
+    if not data:
+        return None, (jsonify({"error": "请求数据不能为空"}), 400)
+    if not isinstance(data, dict):
+        return None, (jsonify({"error": "请求数据格式错误"}), 400)
+    
+    messages = data.get('messages', [])
+    if not isinstance(messages, list) or not all(isinstance(message, dict) for message in messages):
+        return None, (jsonify({"error": "messages必须是消息对象数组"}), 400)
+    
+    api_provider = data.get('provider', 'tongyi')  # 默认使用通义千问
+    
+    # 验证API提供商
+    if api_provider not in API_CONFIGS:
+        return None, (jsonify({"error": f"不支持的API提供商: {api_provider}"}), 400)
+    
+    config = API_CONFIGS[api_provider]
+    
+    # 检查API密钥是否配置
+    if not config['api_key']:
+        return None, (jsonify({"error": f"{config['name']} API密钥未配置"}), 500)
+    
+    # 按提示词token预算压缩对话历史
+    compaction = None
+    if data.get('compact_history', True):
+        messages, compaction = history_compactor.compact(messages, config['context_budget'])
+    
+    # 构建请求参数
+    llm_request = {
+        "model": config['model'],
+        "messages": messages,
+        "stream": data.get('stream', True),
+        "temperature": data.get('temperature', 0.7),
+        "max_tokens": data.get('max_tokens', 2000)
+    }
+    
+    # 设置请求头
+    headers = {
+        "Authorization": f"Bearer {config['api_key']}",
+        "Content-Type": "application/json"
+    }
+    
+    # 本轮请求的日志上下文
+    log_context = {
+        "provider": api_provider,
+        "stream": llm_request['stream'],
+        "messages": len(messages),
+        "prompt_tokens_estimate": compaction["compacted_tokens"] if compaction else None,
+        "tokens_removed": compaction["tokens_removed"] if compaction else 0
+    }
+    
+    return {
+        "provider": api_provider,
+        "endpoint": config['endpoint'],
+        "request": llm_request,
+        "headers": headers,
+        "log_context": log_context
+    }, None
+
 @app.route('/api/llm', methods=['POST'])
 def proxy_llm():
     """
     代理LLM API调用的接口
     接收前端请求，转发到对应的LLM服务，并返回流式响应
+    请求带有utterance_id时，优先复用该次语音输入的推测生成结果
     """
     try:
         # 获取请求数据
         data = request.get_json()
         
-        # 验证必要参数
-        if not data:
-            return jsonify({"error": "请求数据不能为空"}), 400
-        
-        api_provider = data.get('provider', 'tongyi')  # 默认使用通义千问
+        call, error = prepare_llm_call(data)
+        if error:
+            return error
         
-        # 验证API提供商
-        if api_provider not in API_CONFIGS:
-            return jsonify({"error": f"不支持的API提供商: {api_provider}"}), 400
-        
-        config = API_CONFIGS[api_provider]
-        
-        # 检查API密钥是否配置
-        if not config['api_key']:
-            return jsonify({"error": f"{config['name']} API密钥未配置"}), 500
-        
-        # 构建请求参数
-        llm_request = {
-            "model": config['model'],
-            "messages": data.get('messages', []),
-            "stream": data.get('stream', True),
-            "temperature": data.get('temperature', 0.7),
-            "max_tokens": data.get('max_tokens', 2000)
-        }
-        
-        # 设置请求头
-        headers = {
-            "Authorization": f"Bearer {config['api_key']}",
-            "Content-Type": "application/json"
-        }
+        llm_request = call['request']
+        log_context = call['log_context']
+        event_logger.info('llm.request', **log_context)
         
         # 如果是流式请求
         if llm_request.get('stream', True):
-            return stream_llm_response(config['endpoint'], llm_request, headers)
+            speculative_turn = None
+            if data.get('utterance_id') and llm_request['messages']:
+                speculative_turn = speculative_turns.claim(
+                    data['utterance_id'], data.get('agent', 'default'), call['provider'], llm_request
+                )
+                log_context['speculative'] = speculative_turn is not None
+            return stream_llm_response(
+                call['endpoint'], llm_request, call['headers'],
+                sentence_events=bool(data.get('sentence_events', False)),
+                log_context=log_context,
+                speculative_turn=speculative_turn,
+                provider=call['provider']
+            )
         else:
-            return non_stream_llm_response(config['endpoint'], llm_request, headers)
+            return non_stream_llm_response(call['endpoint'], llm_request, call['headers'], log_context=log_context)
             
     except Exception as e:
-        app.logger.error(f"API调用错误: {str(e)}")
+        event_logger.error('llm.proxy_error', error=e)
         return jsonify({"error": "服务器内部错误"}), 500
 
-def stream_llm_response(endpoint, request_data, headers):
+@app.route('/api/llm/speculate', methods=['POST'])
+def speculate_llm():
+    """
+    推测生成接口
+    语音识别中间结果稳定后提前调用，参数与/api/llm相同，另需：
+      utterance_id: 本次语音输入的ID
+      agent: 角色（agent1/agent2）
+      stable_ms: 中间结果已保持不变的毫秒数
+    生成的内容缓存在服务端，等待带相同utterance_id的/api/llm请求认领
+    """
+    try:
+        data = request.get_json()
+        if not data or not data.get('utterance_id'):
+            return jsonify({"success": False, "error": "缺少utterance_id参数"}), 400
+        
+        call, error = prepare_llm_call(dict(data, stream=True))
+        if error:
+            return error
+        
+        llm_request = call['request']
+        if not llm_request['messages']:
+            return jsonify({"success": False, "error": "消息不能为空"}), 400
+        
+        if not speculative_turns.enabled:
+            return jsonify({"success": True, "status": "disabled"})
+        
+        transcript = llm_request['messages'][-1].get('content', '')
+        if not speculative_turns.should_speculate(transcript, data.get('stable_ms', 0)):
+            return jsonify({"success": True, "status": "skipped"})
+        
+        status = speculative_turns.start(
+            data['utterance_id'], data.get('agent', 'default'), call['provider'],
+            call['endpoint'], llm_request, call['headers'], parse_stream_delta
+        )
+        return jsonify({"success": True, "status": status})
+        
+    except Exception as e:
+        event_logger.error('speculation.error', error=e)
+        return jsonify({"success": False, "error": "服务器内部错误"}), 500
+
+@app.route('/api/llm/speculate/cancel', methods=['POST'])
+def cancel_speculation():
+    """
+    取消某次语音输入的推测生成（用户放弃发送时调用）
+    """
+    data = request.get_json() or {}
+    if not data.get('utterance_id'):
+        return jsonify({"success": False, "error": "缺少utterance_id参数"}), 400
+    cancelled = speculative_turns.cancel(data['utterance_id'])
+    return jsonify({"success": True, "cancelled": cancelled})
+
+def sentence_event(index, text):
+    """构造分句事件，前端可据此在模型生成过程中逐句开始语音合成"""
+    return f"data: {json.dumps({'type': 'sentence', 'index': index, 'text': text}, ensure_ascii=False)}\n\n"
+
+def stream_llm_response(endpoint, request_data, headers, sentence_events=False, log_context=None,
+                        speculative_turn=None, provider=None):
     """
     处理流式响应
+    sentence_events为True时，在转发的token流中额外插入完整句子事件：
+    data: {"type": "sentence", "index": 0, "text": "..."}
+    传入speculative_turn时不再请求上游，直接转发推测生成已缓存和后续的内容
+    传入provider时，上游连接中途断开会以已生成内容为前缀续写（同一或其他提供商），
+    客户端看到的是一个不间断的流
     """
     def generate():
+        stream_tracker.opened()
+        response = None
+        tokens_streamed = 0
+        segmenter = IncrementalSentenceSegmenter() if sentence_events else None
+        context = log_context or {}
+        started_at = time.perf_counter()
+        first_token_at = None
+        outcome = 'completed'
+        
+        targets = recovery_targets(provider) if provider else []
+        current_endpoint, current_request, current_headers = endpoint, request_data, headers
+        partial_text = ''
+        recoveries = 0
+        tokens_before_failure = 0
         try:
-            response = requests.post(
-                endpoint,
-                json=request_data,
-                headers=headers,
-                stream=True,
-                timeout=30
-            )
+            while True:
+                finished = False
+                try:
+                    if speculative_turn is not None and recoveries == 0:
+                        lines = speculative_turn.iter_lines()
+                    else:
+                        response = llm_session.post(
+                            current_endpoint,
+                            json=current_request,
+                            headers=current_headers,
+                            stream=True,
+                            timeout=30
+                        )
+                        
+                        if response.status_code in RECOVERABLE_STATUS_CODES:
+                            raise UpstreamStreamError(f"API调用失败，状态码: {response.status_code}")
+                        if response.status_code != 200:
+                            outcome = f"http_{response.status_code}"
+                            error_msg = f"API调用失败，状态码: {response.status_code}"
+                            yield f"data: {json.dumps({'error': error_msg})}\n\n"
+                            return
+                        
+                        lines = response.iter_lines()
+                    
+                    # 逐行读取流式响应
+                    for line in lines:
+                        if line:
+                            line_str = line.decode('utf-8')
+                            if line_str == 'data: [DONE]':
+                                if segmenter:
+                                    for sentence in segmenter.flush():
+                                        yield sentence_event(segmenter.count - 1, sentence)
+                                yield "data: [DONE]\n\n"
+                                finished = True
+                                break
+                            elif line_str.startswith('data: '):
+                                delta, finish_reason = parse_stream_chunk(line_str)
+                                if finish_reason:
+                                    finished = True
+                                if delta:
+                                    partial_text += delta
+                                    tokens_streamed += 1
+                                    if first_token_at is None:
+                                        first_token_at = time.perf_counter()
+                                    event_logger.info('llm.token', index=tokens_streamed, size=len(delta))
+                                # 直接转发SSE格式的数据
+                                yield f"{line_str}\n\n"
+                                if segmenter and delta:
+                                    sentences = segmenter.feed(delta)
+                                    first_index = segmenter.count - len(sentences)
+                                    for offset, sentence in enumerate(sentences):
+                                        yield sentence_event(first_index + offset, sentence)
+                    
+                    if not finished:
+                        raise UpstreamStreamError("上游流式响应在结束前中断")
+                    break
+                    
+                except (requests.exceptions.RequestException, ConnectionError) as e:
+                    if response is not None:
+                        response.close()
+                        response = None
+                    if recoveries >= len(targets):
+                        raise
+                    
+                    # 以已生成的内容为前缀续写，只生成缺失的部分
+                    target = targets[recoveries]
+                    recoveries += 1
+                    if recoveries == 1:
+                        tokens_before_failure = tokens_streamed
+                    event_logger.warning('llm.stream_recovering', attempt=recoveries, target=target,
+                                         partial_chars=len(partial_text), error=e, **context)
+                    current_endpoint, current_request, current_headers = build_continuation_call(
+                        target, request_data, partial_text, tokens_streamed
+                    )
             
-            if response.status_code != 200:
-                error_msg = f"API调用失败，状态码: {response.status_code}"
-                yield f"data: {json.dumps({'error': error_msg})}\n\n"
-                return
+            # 上游未发送[DONE]就结束时，补发最后一句
+            if segmenter:
+                for sentence in segmenter.flush():
+                    yield sentence_event(segmenter.count - 1, sentence)
             
-            # 逐行读取流式响应
-            for line in response.iter_lines():
-                if line:
-                    line_str = line.decode('utf-8')
-                    if line_str.startswith('data: '):
-                        # 直接转发SSE格式的数据
-                        yield f"{line_str}\n\n"
-                    elif line_str == 'data: [DONE]':
-                        yield "data: [DONE]\n\n"
-                        break
+            stream_tracker.record_completed(tokens_streamed)
+            if recoveries:
+                outcome = 'recovered'
+                stream_tracker.record_recovered(tokens_before_failure)
                         
-        except requests.exceptions.RequestException as e:
-            app.logger.error(f"请求异常: {str(e)}")
+        except GeneratorExit:
+            # 客户端断开连接（页面跳转或前端放弃流式改用备用调用），
+            # WSGI服务器关闭生成器，立即中止上游请求，避免继续消耗token
+            outcome = 'cancelled'
+            stream_tracker.record_cancelled(tokens_streamed, request_data.get('max_tokens', 0))
+            raise
+        except (requests.exceptions.RequestException, ConnectionError) as e:
+            outcome = 'network_error'
+            event_logger.error('llm.stream_request_failed', error=e, recoveries=recoveries, **context)
             yield f"data: {json.dumps({'error': '网络请求失败'})}\n\n"
         except Exception as e:
-            app.logger.error(f"流式响应处理错误: {str(e)}")
+            outcome = 'error'
+            event_logger.error('llm.stream_failed', error=e, **context)
             yield f"data: {json.dumps({'error': '响应处理失败'})}\n\n"
+        finally:
+            # 关闭上游响应，释放连接
+            if response is not None:
+                response.close()
+            if speculative_turn is not None and outcome == 'cancelled':
+                speculative_turn.cancel()
+            stream_tracker.closed()
+            finished_at = time.perf_counter()
+            event_logger.info(
+                'llm.stream_end',
+                outcome=outcome,
+                tokens=tokens_streamed,
+                recoveries=recoveries,
+                sentences=segmenter.count if segmenter else None,
+                ttft_ms=round((first_token_at - started_at) * 1000, 1) if first_token_at else None,
+                duration_ms=round((finished_at - started_at) * 1000, 1),
+                **context
+            )
     
     return Response(
         stream_with_context(generate()),
@@ -150,41 +572,223 @@ def stream_llm_response(endpoint, request_data, headers):
         }
     )
 
-def non_stream_llm_response(endpoint, request_data, headers):
+def non_stream_llm_response(endpoint, request_data, headers, log_context=None):
     """
     处理非流式响应
     """
+    context = log_context or {}
+    started_at = time.perf_counter()
     try:
-        response = requests.post(
+        response = llm_session.post(
             endpoint,
             json=request_data,
             headers=headers,
             timeout=30
         )
         
+        event_logger.info(
+            'llm.response',
+            status=response.status_code,
+            size=len(response.content),
+            duration_ms=round((time.perf_counter() - started_at) * 1000, 1),
+            **context
+        )
+        
         if response.status_code == 200:
             return jsonify(response.json())
         else:
             return jsonify({"error": f"API调用失败，状态码: {response.status_code}"}), response.status_code
             
     except requests.exceptions.RequestException as e:
-        app.logger.error(f"请求异常: {str(e)}")
+        event_logger.error('llm.request_failed', error=e, **context)
         return jsonify({"error": "网络请求失败"}), 500
     except Exception as e:
-        app.logger.error(f"响应处理错误: {str(e)}")
+        event_logger.error('llm.response_failed', error=e, **context)
         return jsonify({"error": "响应处理失败"}), 500
 
+def run_batch_item(index, item_id, call):
+    """
+    执行批量请求中的一项，返回一行NDJSON结果
+    """
+    started_at = time.perf_counter()
+    result = {"index": index, "id": item_id}
+    try:
+        with batch_upstream_slots:
+            response = llm_session.post(
+                call['endpoint'],
+                json=call['request'],
+                headers=call['headers'],
+                timeout=30
+            )
+        
+        if response.status_code == 200:
+            body = response.json()
+            choices = body.get('choices') or [{}]
+            result.update({
+                "success": True,
+                "content": (choices[0].get('message') or {}).get('content', ''),
+                "usage": body.get('usage')
+            })
+        else:
+            result.update({"success": False, "error": f"API调用失败，状态码: {response.status_code}"})
+    except requests.exceptions.RequestException as e:
+        event_logger.error('llm.batch_item_failed', index=index, error=e, **call['log_context'])
+        result.update({"success": False, "error": "网络请求失败"})
+    except Exception as e:
+        event_logger.error('llm.batch_item_failed', index=index, error=e, **call['log_context'])
+        result.update({"success": False, "error": "响应处理失败"})
+    
+    result["duration_ms"] = round((time.perf_counter() - started_at) * 1000, 1)
+    return result
+
+@app.route('/api/llm/batch', methods=['POST'])
+def batch_llm():
+    """
+    批量LLM调用接口
+    对多组互相独立的消息并发调用同一个提供商，每完成一项就以NDJSON格式返回一行结果
+    
+    请求示例:
+        {
+            "provider": "tongyi",
+            "items": [{"id": "s1", "messages": [...]}, {"id": "s2", "messages": [...]}],
+            "temperature": 0.7,
+            "max_tokens": 1000,
+            "parallelism": 4
+        }
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or not isinstance(data.get('items'), list) or not data['items']:
+            return jsonify({"error": "items不能为空"}), 400
+        
+        items = data['items']
+        if len(items) > BATCH_MAX_ITEMS:
+            return jsonify({"error": f"单次最多{BATCH_MAX_ITEMS}项"}), 400
+        
+        # 先校验并构建全部请求，参数错误时整体返回400
+        calls = []
+        for index, item in enumerate(items):
+            if not isinstance(item, dict) or not item.get('messages'):
+                return jsonify({"error": f"第{index}项缺少messages"}), 400
+            if not isinstance(item['messages'], list) or not all(isinstance(message, dict) for message in item['messages']):
+                return jsonify({"error": f"第{index}项的messages必须是消息对象数组"}), 400
+            item_data = {key: value for key, value in data.items() if key not in ('items', 'parallelism')}
+            item_data.update(messages=item['messages'], stream=False)
+            call, error = prepare_llm_call(item_data)
+            if error:
+                return error
+            calls.append((index, item.get('id', index), call))
+        
+        try:
+            parallelism = int(data.get('parallelism', BATCH_DEFAULT_PARALLELISM))
+        except (TypeError, ValueError):
+            return jsonify({"error": "parallelism必须是整数"}), 400
+        parallelism = max(1, min(parallelism, BATCH_MAX_PARALLELISM, len(calls)))
+        
+        event_logger.info('llm.batch_request', items=len(calls), parallelism=parallelism,
+                          provider=calls[0][2]['provider'])
+        
+    except Exception as e:
+        event_logger.error('llm.batch_error', error=e)
+        return jsonify({"error": "服务器内部错误"}), 500
+    
+    def generate():
+        started_at = time.perf_counter()
+        succeeded = 0
+        executor = ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix='llm-batch')
+        futures = []
+        try:
+            futures = [executor.submit(run_batch_item, *call) for call in calls]
+            for future in as_completed(futures):
+                result = future.result()
+                succeeded += 1 if result.get('success') else 0
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+            
+            yield json.dumps({
+                "type": "summary",
+                "total": len(calls),
+                "succeeded": succeeded,
+                "failed": len(calls) - succeeded,
+                "parallelism": parallelism,
+                "duration_ms": round((time.perf_counter() - started_at) * 1000, 1)
+            }, ensure_ascii=False) + "\n"
+        finally:
+            # 客户端断开时不再发起尚未开始的请求
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={
+            'Cache-Control': 'no-cache',
+            'Access-Control-Allow-Origin': '*'
+        }
+    )
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """
     健康检查接口
     """
+    if stream_tracker.draining:
+        return jsonify({
+            "status": "draining",
+            "message": "服务正在重启，等待进行中的流式响应结束",
+            "active_streams": stream_tracker.active
+        }), 503
+
     return jsonify({
         "status": "healthy",
         "message": "Flask LLM代理服务运行正常",
-        "supported_providers": list(API_CONFIGS.keys())
+        "supported_providers": list(API_CONFIGS.keys()),
+        "active_streams": stream_tracker.active
     })
 
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """
+    运行指标接口
+    """
+    metrics = {
+        "streams": stream_tracker.get_stats(),
+        "history": history_compactor.get_stats(),
+        "logging": event_logger.get_stats(),
+        "speculation": speculative_turns.get_stats(),
+        "audio_blobs": audio_blob_store.get_stats(),
+        "static_assets": static_assets.get_stats()
+    }
+    if SPEECH_AVAILABLE:
+        metrics["asr_gateway"] = asr_gateway.get_stats()
+    return jsonify(metrics)
+
+@app.route('/api/admin/profiler', methods=['GET', 'POST'])
+def admin_profiler():
+    """
+    采样分析管理接口（请求头需携带 X-Profile-Token）
+    GET: 查看状态和最近生成的采样文件
+    POST: 预约接下来的N个匹配请求进行采样
+        {"requests": 5, "path_prefix": "/api/llm", "hz": 50}
+    预约和状态都只属于处理本请求的worker进程（响应中的pid），多worker部署时请使用请求头方式
+    """
+    if not request_profiler.check_token(request.headers.get('X-Profile-Token')):
+        return jsonify({"success": False, "error": "未授权"}), 403
+    
+    if request.method == 'POST':
+        data = request.get_json() or {}
+        try:
+            stats = request_profiler.arm(
+                requests=data.get('requests', 1),
+                path_prefix=data.get('path_prefix'),
+                hz=data.get('hz')
+            )
+        except (TypeError, ValueError):
+            return jsonify({"success": False, "error": "参数格式错误"}), 400
+        return jsonify({"success": True, "profiler": stats})
+    
+    return jsonify({"success": True, "profiler": request_profiler.get_stats()})
+
 @app.route('/api/providers', methods=['GET'])
 def get_providers():
     """
@@ -203,6 +807,37 @@ def get_providers():
 if SPEECH_AVAILABLE:
     sts_api_handler.register_routes(app)
 
+def init_socketio(app):
+    """
+    初始化SocketIO
+    多进程部署时通过SOCKETIO_MESSAGE_QUEUE在进程间同步事件，
+    并只允许websocket传输，使每个连接固定在同一个worker上，无需粘性会话
+    """
+    try:
+        from flask_socketio import SocketIO
+    except ImportError as e:
+        print(f"⚠️ SocketIO模块导入失败: {e}")
+        return None
+
+    options = {"cors_allowed_origins": "*"}
+    message_queue = os.getenv('SOCKETIO_MESSAGE_QUEUE')
+    if message_queue:
+        options["message_queue"] = message_queue
+    if int(os.getenv('SERVER_WORKERS', '1')) > 1:
+        options["transports"] = ["websocket"]
+
+    socketio = SocketIO(app, **options)
+    create_sts_socketio_handler(socketio)
+    create_asr_gateway_socketio_handler(socketio)
+    return socketio
+
+socketio = None
+if SPEECH_AVAILABLE:
+    try:
+        socketio = init_socketio(app)
+    except Exception as e:
+        print(f"❌ SocketIO设置失败: {e}")
+
 @app.route('/api/speech/audio/process', methods=['POST'])
 def process_audio():
     """
@@ -214,6 +849,7 @@ def process_audio():
             "error": "语音功能不可用"
         }), 503
     
+    started_at = time.perf_counter()
     try:
         data = request.get_json()
         if not data:
@@ -239,14 +875,27 @@ def process_audio():
                 "error": "音频数据解码失败"
             }), 400
         
-        # 提取音频信息
-        audio_info = audio_processor.extract_audio_info(audio_data, source_format)
-        
-        # 验证音频质量
-        quality_ok, quality_msg = audio_processor.validate_audio_quality(audio_data)
+        # 浏览器上传的压缩音频（WebM/Ogg Opus）按实际内容识别，不依赖客户端声明的格式
+        detected_format = audio_processor.detect_audio_format(audio_data)
+        if detected_format in audio_processor.COMPRESSED_FORMATS:
+            source_format = detected_format
         
         # 转换为PCM格式
         pcm_data = audio_processor.convert_to_pcm(audio_data, source_format)
+        if source_format in audio_processor.COMPRESSED_FORMATS and not pcm_data:
+            return jsonify({
+                "success": False,
+                "error": f"{source_format}音频解码失败"
+            }), 400
+        
+        # 压缩音频在解码后的PCM上提取信息和检查质量
+        analysis_data = pcm_data if source_format in audio_processor.COMPRESSED_FORMATS else audio_data
+        
+        # 提取音频信息
+        audio_info = audio_processor.extract_audio_info(analysis_data, source_format)
+        
+        # 验证音频质量
+        quality_ok, quality_msg = audio_processor.validate_audio_quality(analysis_data)
         
         response_data = {
             "success": True,
@@ -260,17 +909,65 @@ def process_audio():
         }
         
         if pcm_data:
-            response_data["processed_audio"] = audio_processor.audio_to_base64(pcm_data)
+            # 处理后的音频写入本地存储，响应中只返回句柄，客户端需要时再通过GET获取
+            if audio_processor.detect_audio_format(pcm_data) == 'wav':
+                # WAV输入已带文件头，原样存储，避免把原RIFF头当作样本数据再包一层
+                blob_id = audio_blob_store.put(pcm_data)
+            else:
+                blob_id = audio_blob_store.put_pcm(
+                    pcm_data,
+                    audio_processor.TARGET_SAMPLE_RATE,
+                    audio_processor.TARGET_CHANNELS,
+                    audio_processor.TARGET_SAMPLE_WIDTH
+                )
+            response_data["processed_audio_id"] = blob_id
+            response_data["processed_audio_url"] = f"/api/speech/audio/blob/{blob_id}"
+            
+            # 兼容旧客户端：显式要求时仍内联返回base64
+            if data.get('inline_audio'):
+                response_data["processed_audio"] = audio_processor.audio_to_base64(pcm_data)
+        
+        event_logger.info(
+            'audio.processed',
+            source_format=source_format,
+            input_bytes=len(audio_data),
+            output_bytes=len(pcm_data) if pcm_data else 0,
+            quality_passed=quality_ok,
+            duration_ms=round((time.perf_counter() - started_at) * 1000, 1)
+        )
         
         return jsonify(response_data)
         
     except Exception as e:
-        app.logger.error(f"音频处理失败: {e}")
+        event_logger.error('audio.process_failed', error=e)
         return jsonify({
             "success": False,
             "error": str(e)
         }), 500
 
+@app.route('/api/speech/audio/blob/<blob_id>', methods=['GET'])
+def get_audio_blob(blob_id):
+    """
+    获取处理后的音频（WAV）
+    内容寻址，支持ETag条件请求和Range分段读取，由WSGI服务器以零拷贝方式发送文件
+    """
+    not_found = jsonify({
+        "success": False,
+        "error": "音频不存在或已过期"
+    }), 404
+    path = audio_blob_store.open_path(blob_id)
+    if path is None:
+        return not_found
+    
+    try:
+        response = send_file(path, mimetype='audio/wav', conditional=True, etag=blob_id)
+    except FileNotFoundError:
+        # 检查与发送之间文件可能恰好被过期清理删除
+        return not_found
+    
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
 if __name__ == '__main__':
     # 检查环境变量配置
     print("🚀 启动Flask LLM代理服务...")
@@ -307,16 +1004,10 @@ if __name__ == '__main__':
             print("  🎉 语音功能已就绪！")
         else:
             print("  ⚠️ 语音功能配置不完整")
-            
-        # 设置SocketIO支持
-        try:
-            from flask_socketio import SocketIO
-            socketio = SocketIO(app, cors_allowed_origins="*")
-            sts_socketio_handler = create_sts_socketio_handler(socketio)
+
+        if socketio is not None:
             print("  🔗 STS SocketIO服务已启用")
-        except Exception as e:
-            print(f"  ❌ SocketIO设置失败: {e}")
-            
+
     else:
         print("  ❌ 语音功能模块不可用")
     
@@ -328,8 +1019,10 @@ if __name__ == '__main__':
         print("🔑 STS临时密钥: http://localhost:4399/api/speech/sts-credentials")
         print("🔊 音频处理: http://localhost:4399/api/speech/audio/process")
     
-    # 启动服务器
-    if SPEECH_AVAILABLE and 'socketio' in locals():
+    print("\n💡 生产环境请使用: python start-backend.py --production")
+    
+    # 启动开发服务器
+    if socketio is not None:
         # 使用SocketIO运行（支持WebSocket）
         socketio.run(app, debug=True, host='0.0.0.0', port=4399)
     else:
@@ -0,0 +1,274 @@
+import re
+import json
+import time
+import hashlib
+import threading
+from event_logger import event_logger
+
+
+_PUNCTUATION_PATTERN = re.compile(r'[^\w\s]')
+
+# 识别结果末尾可以忽略的语气词
+FILLER_WORDS = {'um', 'uh', 'er', 'erm', 'ah', 'hmm', 'mm', 'uhm'}
+
+
+def normalize_transcript(text):
+    """比较识别结果前去掉大小写、标点和多余空白"""
+    return ' '.join(_PUNCTUATION_PATTERN.sub(' ', (text or '').lower()).split())
+
+
+def _strip_trailing_fillers(words):
+    while words and words[-1] in FILLER_WORDS:
+        words = words[:-1]
+    return words
+
+
+def transcripts_match(a, b):
+    """
+    两次识别文本是否可以视为同一句话：
+    只允许大小写、标点、空白以及末尾语气词不同，任何实词变化都不匹配
+    """
+    words_a = normalize_transcript(a).split()
+    words_b = normalize_transcript(b).split()
+    return words_a == words_b or _strip_trailing_fillers(words_a) == _strip_trailing_fillers(words_b)
+
+
+def context_key(provider, request_data):
+    """除最后一条用户输入外的请求内容摘要，用于确认推测请求与最终请求的上下文一致"""
+    payload = {
+        "provider": provider,
+        "model": request_data.get('model'),
+        "messages": request_data.get('messages', [])[:-1],
+        "temperature": request_data.get('temperature'),
+        "max_tokens": request_data.get('max_tokens')
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class SpeculativeTurn:
+    """一次推测生成：后台线程读取上游流式响应并缓存到内存"""
+
+    def __init__(self, utterance_id, agent, transcript, context):
+        self.utterance_id = utterance_id
+        self.agent = agent
+        self.transcript = transcript
+        self.context = context
+        self.created_at = time.time()
+        self.lines = []
+        self.tokens = 0
+        self.done = False
+        self.error = None
+        self.cancelled = False
+        self.claimed = False
+        self.response = None
+        self._condition = threading.Condition()
+
+    def run(self, session, endpoint, request_data, headers, parse_delta):
+        try:
+            self.response = session.post(endpoint, json=request_data, headers=headers,
+                                         stream=True, timeout=30)
+            if self.response.status_code != 200:
+                self.error = f"API调用失败，状态码: {self.response.status_code}"
+                return
+            for line in self.response.iter_lines():
+                if self.cancelled:
+                    return
+                if not line:
+                    continue
+                line_str = line.decode('utf-8')
+                if line_str.startswith('data: ') and parse_delta(line_str):
+                    self.tokens += 1
+                with self._condition:
+                    self.lines.append(line)
+                    self._condition.notify_all()
+                if line_str == 'data: [DONE]':
+                    break
+        except Exception as e:
+            if not self.cancelled:
+                self.error = str(e)
+                event_logger.warning('speculation.upstream_failed', utterance_id=self.utterance_id,
+                                     agent=self.agent, error=e)
+        finally:
+            if self.response is not None:
+                self.response.close()
+            with self._condition:
+                self.done = True
+                self._condition.notify_all()
+
+    def cancel(self):
+        self.cancelled = True
+        response = self.response
+        if response is not None:
+            response.close()
+        with self._condition:
+            self._condition.notify_all()
+
+    def iter_lines(self, timeout=30):
+        """
+        先回放已缓存的行，再继续等待后台线程读到的新行
+        与requests的Response.iter_lines一样返回bytes
+        """
+        index = 0
+        while True:
+            with self._condition:
+                if index >= len(self.lines) and not self.done and not self.cancelled:
+                    self._condition.wait(timeout)
+                pending = self.lines[index:]
+                finished = self.done or self.cancelled
+            for line in pending:
+                yield line
+            index += len(pending)
+            if finished and index >= len(self.lines):
+                if self.error:
+                    raise ConnectionError(self.error)
+                return
+
+
+class SpeculativeTurnManager:
+    """
+    推测生成管理器
+    语音识别的中间结果稳定后，前端以utterance_id提前发起agent请求；
+    最终识别结果与推测时的文本一致（只差大小写、标点或末尾语气词）时直接复用已生成的内容，否则取消
+
+    推测结果只保存在当前进程内存中，推测请求和最终请求必须落在同一进程；
+    多worker部署时传入enabled=False关闭该功能，避免推测结果无人认领、白白消耗token
+    """
+
+    def __init__(self, session, enabled=True, min_stable_ms=600, min_words=3,
+                 ttl=30, max_turns=64):
+        self.session = session
+        self.enabled = enabled
+        self.min_stable_ms = min_stable_ms
+        self.min_words = min_words
+        self.ttl = ttl
+        self.max_turns = max_turns
+        self.turns = {}
+        self._lock = threading.Lock()
+
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.tokens_ready_at_claim = 0
+        self.tokens_wasted = 0
+
+    def should_speculate(self, transcript, stable_ms):
+        """识别文本足够长且保持不变足够久才值得推测"""
+        return (self.enabled and stable_ms >= self.min_stable_ms
+                and len(normalize_transcript(transcript).split()) >= self.min_words)
+
+    def start(self, utterance_id, agent, provider, endpoint, request_data, headers, parse_delta):
+        """
+        为 (utterance_id, agent) 启动推测生成
+        已有相同文本的推测时直接复用，文本变化时取消旧的重新开始
+
+        Returns:
+            str: started / reused
+        """
+        transcript = request_data['messages'][-1].get('content', '')
+        context = context_key(provider, request_data)
+        key = (utterance_id, agent)
+
+        self._purge_expired()
+        with self._lock:
+            existing = self.turns.get(key)
+            if (existing and not existing.cancelled and existing.context == context
+                    and transcripts_match(existing.transcript, transcript)):
+                return 'reused'
+            if existing:
+                self._discard(key, existing)
+            if len(self.turns) >= self.max_turns:
+                oldest_key = min(self.turns, key=lambda k: self.turns[k].created_at)
+                self._discard(oldest_key, self.turns[oldest_key])
+
+            turn = SpeculativeTurn(utterance_id, agent, transcript, context)
+            self.turns[key] = turn
+            self.started += 1
+
+        threading.Thread(
+            target=turn.run,
+            args=(self.session, endpoint, request_data, headers, parse_delta),
+            name=f'speculation-{agent}',
+            daemon=True
+        ).start()
+        event_logger.info('speculation.started', utterance_id=utterance_id, agent=agent,
+                          words=len(normalize_transcript(transcript).split()))
+        return 'started'
+
+    def claim(self, utterance_id, agent, provider, request_data):
+        """
+        用最终请求认领推测结果
+        匹配时返回SpeculativeTurn，不匹配时取消推测并返回None；
+        找不到推测（未启动、已过期或被跳过）也计为未命中
+        """
+        if not self.enabled:
+            return None
+
+        key = (utterance_id, agent)
+        with self._lock:
+            turn = self.turns.pop(key, None)
+            if turn is None:
+                self.misses += 1
+        if turn is None:
+            event_logger.info('speculation.claim', utterance_id=utterance_id, agent=agent,
+                              matched=False, found=False)
+            return None
+
+        transcript = request_data['messages'][-1].get('content', '')
+        matched = (not turn.cancelled and turn.error is None
+                   and turn.context == context_key(provider, request_data)
+                   and transcripts_match(turn.transcript, transcript))
+
+        with self._lock:
+            if matched:
+                turn.claimed = True
+                self.hits += 1
+                self.tokens_ready_at_claim += turn.tokens
+            else:
+                self.misses += 1
+        if not matched:
+            turn.cancel()
+            with self._lock:
+                self.tokens_wasted += turn.tokens
+
+        event_logger.info('speculation.claim', utterance_id=utterance_id, agent=agent,
+                          matched=matched, found=True,
+                          buffered_tokens=turn.tokens, head_start_ms=round((time.time() - turn.created_at) * 1000))
+        return turn if matched else None
+
+    def cancel(self, utterance_id):
+        """取消某次语音输入的全部推测（例如用户放弃发送）"""
+        with self._lock:
+            keys = [key for key in self.turns if key[0] == utterance_id]
+            for key in keys:
+                self._discard(key, self.turns[key])
+        return len(keys)
+
+    def _discard(self, key, turn):
+        """调用方需持有锁"""
+        self.turns.pop(key, None)
+        turn.cancel()
+        self.tokens_wasted += turn.tokens
+
+    def _purge_expired(self):
+        now = time.time()
+        with self._lock:
+            expired = [key for key, turn in self.turns.items() if now - turn.created_at > self.ttl]
+            for key in expired:
+                self._discard(key, self.turns[key])
+                self.expired += 1
+
+    def get_stats(self):
+        with self._lock:
+            claims = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "active": len(self.turns),
+                "started": self.started,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "hit_rate": round(self.hits / claims, 3) if claims else None,
+                "tokens_ready_at_claim": self.tokens_ready_at_claim,
+                "tokens_wasted": self.tokens_wasted
+            }
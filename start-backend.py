@@ -2,6 +2,10 @@
 """
 英语对话助手后端启动脚本
 用于启动Flask LLM代理服务
+
+用法:
+    python start-backend.py                # 开发模式（单进程，debug）
+    python start-backend.py --production   # 生产模式（Gunicorn多进程）
 """
 
 import os
@@ -97,10 +101,36 @@ def start_server():
         print(f"❌ 服务启动失败: {e}")
         sys.exit(1)
 
+def start_production_server():
+    """使用Gunicorn启动多进程生产服务"""
+    config_file = Path("gunicorn.conf.py")
+    if not config_file.exists():
+        print("❌ 错误：gunicorn.conf.py文件不存在")
+        sys.exit(1)
+    
+    print("\n🚀 启动生产环境服务 (Gunicorn)...")
+    print("🌐 服务地址: http://localhost:4399")
+    print("🔍 健康检查: http://localhost:4399/api/health")
+    print("♻️  更新代码: kill -USR2 <master pid>，新worker就绪后 kill -TERM <旧master pid>")
+    print("♻️  仅重载配置: kill -HUP <master pid>")
+    print("\n按 Ctrl+C 停止服务\n")
+    
+    try:
+        subprocess.run([
+            sys.executable, "-m", "gunicorn", "-c", str(config_file), "server:app"
+        ], check=True)
+    except KeyboardInterrupt:
+        print("\n\n🛑 服务已停止")
+    except subprocess.CalledProcessError as e:
+        print(f"❌ 服务启动失败: {e}")
+        sys.exit(1)
+
 def main():
     """主函数"""
     print("🎯 英语对话助手 - 后端服务启动器\n")
     
+    production = "--production" in sys.argv[1:]
+    
     # 检查运行环境
     check_python_version()
     check_pip()
@@ -120,7 +150,10 @@ def main():
         sys.exit(1)
     
     # 启动服务器
-    start_server()
+    if production:
+        start_production_server()
+    else:
+        start_server()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
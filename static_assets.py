@@ -0,0 +1,210 @@
+import os
+import re
+import gzip
+import glob
+import hashlib
+import mimetypes
+import threading
+from flask import Response
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+
+class StaticAsset:
+    """单个静态资源：原始内容及其预压缩版本"""
+
+    def __init__(self, path, data, mtime):
+        self.path = path
+        self.mtime = mtime
+        self.version = hashlib.sha256(data).hexdigest()[:16]
+        self.etag = self.version
+
+        mimetype, _ = mimetypes.guess_type(path)
+        self.mimetype = mimetype or 'application/octet-stream'
+        if self.mimetype.startswith('text/') or self.mimetype.endswith('javascript'):
+            self.mimetype += '; charset=utf-8'
+
+        # 只保留比原文件更小的压缩版本
+        self.variants = {'identity': data}
+        gzipped = gzip.compress(data, compresslevel=9, mtime=0)
+        if len(gzipped) < len(data):
+            self.variants['gzip'] = gzipped
+        if BROTLI_AVAILABLE:
+            compressed = brotli.compress(data, quality=11)
+            if len(compressed) < len(data):
+                self.variants['br'] = compressed
+
+    def variant_etag(self, encoding):
+        if encoding == 'identity':
+            return f'"{self.etag}"'
+        return f'"{self.etag}-{encoding}"'
+
+
+class StaticAssetCache:
+    """
+    静态资源缓存
+    启动时一次性读取白名单内的前端资源，预先生成gzip/brotli版本并常驻内存，
+    使用内容哈希作为ETag，支持条件请求返回304
+    """
+
+    # 允许对外提供的前端资源，其他仓库文件（.py、.env、文档等）一律不暴露
+    ASSET_PATTERNS = [
+        'index.html',
+        'app.js',
+        'js/*.js',
+        'vendor/tencent-speech-sdk/asr/dist/*.js',
+        'vendor/tencent-speech-sdk/soe/dist/*.js',
+    ]
+
+    # 入口页面不能长期缓存，其他资源通过 ?v=<内容哈希> 引用后可以永久缓存
+    ENTRY_PAGE = 'index.html'
+    IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+    REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+    # 匹配 index.html 中 src="..." / href="..." 的本地资源引用
+    REFERENCE_PATTERN = re.compile(r'(src|href)="([^"?#:]+)"')
+
+    def __init__(self, root='.'):
+        self.root = os.path.abspath(root)
+        self.assets = {}
+        self._lock = threading.Lock()
+
+    def _asset_paths(self):
+        paths = []
+        for pattern in self.ASSET_PATTERNS:
+            for full_path in glob.glob(os.path.join(self.root, pattern)):
+                if os.path.isfile(full_path):
+                    paths.append(os.path.relpath(full_path, self.root).replace(os.sep, '/'))
+        return sorted(set(paths))
+
+    def _read(self, path):
+        full_path = os.path.join(self.root, path)
+        with open(full_path, 'rb') as f:
+            data = f.read()
+        return data, os.path.getmtime(full_path)
+
+    def build(self):
+        """读取并压缩全部资源，入口页面中的资源引用会附加版本号"""
+        assets = {}
+        entry = None
+
+        for path in self._asset_paths():
+            data, mtime = self._read(path)
+            if path == self.ENTRY_PAGE:
+                entry = (data, mtime)
+                continue
+            assets[path] = StaticAsset(path, data, mtime)
+
+        if entry is not None:
+            data, mtime = entry
+            assets[self.ENTRY_PAGE] = StaticAsset(
+                self.ENTRY_PAGE, self._version_references(data, assets), mtime
+            )
+
+        with self._lock:
+            self.assets = assets
+        return len(assets)
+
+    def _version_references(self, html, assets):
+        def replace(match):
+            attr, path = match.group(1), match.group(2)
+            asset = assets.get(path)
+            if asset is None:
+                return match.group(0)
+            return f'{attr}="{path}?v={asset.version}"'
+
+        return self.REFERENCE_PATTERN.sub(replace, html.decode('utf-8')).encode('utf-8')
+
+    def _is_stale(self):
+        """开发模式下检查文件是否被修改"""
+        for path, asset in self.assets.items():
+            try:
+                if os.path.getmtime(os.path.join(self.root, path)) != asset.mtime:
+                    return True
+            except OSError:
+                return True
+        return set(self._asset_paths()) != set(self.assets)
+
+    def get(self, path):
+        return self.assets.get(path)
+
+    def _choose_encoding(self, asset, accept_encodings):
+        for encoding in ('br', 'gzip'):
+            if encoding in asset.variants and accept_encodings[encoding]:
+                return encoding
+        return 'identity'
+
+    @staticmethod
+    def _etag_matches(if_none_match, asset):
+        for tag in if_none_match.split(','):
+            tag = tag.strip()
+            if tag == '*':
+                return True
+            if tag.startswith('W/'):
+                tag = tag[2:]
+            tag = tag.strip('"')
+            if tag == asset.etag or tag.startswith(f'{asset.etag}-'):
+                return True
+        return False
+
+    def serve(self, path, request, auto_reload=False):
+        """
+        返回资源对应的响应，资源不在白名单内时返回None
+
+        Args:
+            path: 请求的相对路径
+            request: 当前Flask请求对象
+            auto_reload: 文件变化时重新构建（开发模式）
+        """
+        if auto_reload and self._is_stale():
+            self.build()
+
+        asset = self.get(path)
+        if asset is None:
+            return None
+
+        if path != self.ENTRY_PAGE and request.args.get('v') == asset.version:
+            cache_control = self.IMMUTABLE_CACHE_CONTROL
+        else:
+            cache_control = self.REVALIDATE_CACHE_CONTROL
+
+        encoding = self._choose_encoding(asset, request.accept_encodings)
+        headers = {
+            'ETag': asset.variant_etag(encoding),
+            'Cache-Control': cache_control,
+            'Vary': 'Accept-Encoding',
+        }
+
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match and self._etag_matches(if_none_match, asset):
+            return Response(status=304, headers=headers)
+
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+
+        return Response(asset.variants[encoding], content_type=asset.mimetype, headers=headers)
+
+    def get_stats(self):
+        """
+        返回资源数量及压缩前后的大小
+        压缩版本只统计实际生成了该版本的资源（同时给出这些资源的原始大小），没有任何资源生成该版本时为None
+        """
+        stats = {
+            "assets": len(self.assets),
+            "brotli_available": BROTLI_AVAILABLE,
+            "identity_bytes": sum(len(asset.variants['identity']) for asset in self.assets.values())
+        }
+        for encoding in ('gzip', 'br'):
+            compressed = [asset for asset in self.assets.values() if encoding in asset.variants]
+            stats[f"{encoding}_assets"] = len(compressed)
+            stats[f"{encoding}_bytes"] = sum(len(asset.variants[encoding]) for asset in compressed) if compressed else None
+            stats[f"{encoding}_original_bytes"] = sum(len(asset.variants['identity']) for asset in compressed) if compressed else None
+        return stats
+
+
+# 全局静态资源缓存实例
+static_assets = StaticAssetCache(os.path.dirname(os.path.abspath(__file__)))
@@ -2,9 +2,12 @@ import os
 import json
 import uuid
 import time
+import base64
 from flask import request, jsonify
 from flask_socketio import emit
 from speech_service import sts_session_manager
+from asr_gateway import asr_gateway
+from audio_processor import AudioProcessor
 
 class STSAPIHandler:
     """STS临时密钥API处理器"""
@@ -203,9 +206,90 @@ class STSSocketIOHandler:
                     "error": str(e)
                 })
 
+
+class ASRGatewaySocketIOHandler:
+    """
+    语音识别网关的SocketIO事件处理器
+    客户端不再获取临时密钥直连腾讯云，而是通过当前SocketIO连接上传音频：
+      asr_start {backend?, sample_rate?}   -> asr_started {stream_id, chunk_size, ...} / asr_error
+      asr_audio {stream_id, audio}         -> ack {accepted, backlog_ms}，accepted为False时应暂停发送
+      asr_stop  {stream_id}                -> asr_result(final) ... asr_closed
+    识别结果通过 asr_result {stream_id, type: interim/final, text, index} 推送
+    """
+    
+    def __init__(self, socketio):
+        self.socketio = socketio
+        self.gateway = asr_gateway
+        self.gateway.emit = lambda sid, event, payload: self.socketio.emit(event, payload, to=sid)
+        self.register_events()
+    
+    def register_events(self):
+        """注册SocketIO事件"""
+        
+        @self.socketio.on('asr_start')
+        def handle_asr_start(data=None):
+            """打开一路识别流"""
+            data = data or {}
+            try:
+                sample_rate = int(data.get('sample_rate', AudioProcessor.TARGET_SAMPLE_RATE))
+            except (TypeError, ValueError):
+                sample_rate = 0
+            
+            stream, error = self.gateway.open_stream(
+                request.sid,
+                backend_name=data.get('backend'),
+                sample_rate=sample_rate,
+                stream_id=data.get('stream_id')
+            )
+            if error:
+                emit('asr_error', {
+                    "success": False,
+                    "error": error
+                })
+                return
+            
+            emit('asr_started', {
+                "success": True,
+                "stream_id": stream.id,
+                "backend": stream.backend.name,
+                "chunk_size": AudioProcessor.CHUNK_SIZE,
+                "max_backlog_ms": self.gateway.max_pending_bytes // self.gateway.BYTES_PER_MS
+            })
+        
+        @self.socketio.on('asr_audio')
+        def handle_asr_audio(data):
+            """接收一帧PCM音频（二进制或base64），通过ack返回背压状态"""
+            audio = data.get('audio')
+            if isinstance(audio, str):
+                try:
+                    audio = base64.b64decode(audio)
+                except ValueError:
+                    return {"accepted": False, "error": "音频数据解码失败"}
+            if not audio:
+                return {"accepted": False, "error": "音频数据为空"}
+            return self.gateway.push_audio(request.sid, data.get('stream_id'), bytes(audio))
+        
+        @self.socketio.on('asr_stop')
+        def handle_asr_stop(data):
+            """音频结束，输出最终结果后关闭识别流"""
+            if not self.gateway.close_stream(request.sid, data.get('stream_id')):
+                emit('asr_error', {
+                    "success": False,
+                    "error": "识别流不存在"
+                })
+        
+        @self.socketio.on('disconnect')
+        def handle_disconnect(*args):
+            """客户端断开时释放其全部识别流"""
+            self.gateway.close_client(request.sid)
+
 # 全局处理器实例
 sts_api_handler = STSAPIHandler()
 
 def create_sts_socketio_handler(socketio):
     """创建STS SocketIO处理器"""
-    return STSSocketIOHandler(socketio) 
\ No newline at end of file
+    return STSSocketIOHandler(socketio)
+
+def create_asr_gateway_socketio_handler(socketio):
+    """创建语音识别网关SocketIO处理器"""
+    return ASRGatewaySocketIOHandler(socketio) 
\ No newline at end of file